@@ -0,0 +1,66 @@
+# Communication_LTD/password_config.py
+import json
+from functools import lru_cache
+from pathlib import Path
+from django.conf import settings
+
+# קובץ הקונפיגורציה (settings.PASSWORD_CONFIG_PATH) נקרא פעם אחת לתהליך, ורק בשימוש הראשון (לא בזמן import)
+BASE_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_PASSWORD_CONFIG_PATH = BASE_DIR / 'password_config.json'
+
+DEFAULT_PASSWORD_CONFIG = {
+    "min_password_length": 10,
+    "password_requirements": {
+        "uppercase": True,
+        "lowercase": True,
+        "digits": True,
+        "special_characters": True
+    },
+    "password_history": 3,
+    "dictionary_check": True,
+    "login_attempts": 3
+}
+
+# password_config.json משתמש בשמות מפתחות שטוחים - ממפים אותם למבנה שהקוד מצפה לו
+FLAT_KEYS = {
+    "min_length": ("min_password_length",),
+    "require_uppercase": ("password_requirements", "uppercase"),
+    "require_lowercase": ("password_requirements", "lowercase"),
+    "require_numbers": ("password_requirements", "digits"),
+    "require_special": ("password_requirements", "special_characters"),
+    "prevent_dictionary": ("dictionary_check",),
+}
+
+
+def load_password_config(path=None):
+    """Return the password policy from `path` (default settings.PASSWORD_CONFIG_PATH), merged over the defaults."""
+    if path is None:
+        path = getattr(settings, 'PASSWORD_CONFIG_PATH', DEFAULT_PASSWORD_CONFIG_PATH)
+    return _read_password_config(str(path))
+
+
+@lru_cache(maxsize=None)
+def _read_password_config(path):
+    """Parse one config file (cached per process and path)."""
+    config = json.loads(json.dumps(DEFAULT_PASSWORD_CONFIG))
+    if not Path(path).exists():
+        return config
+    with open(path, 'r', encoding='utf-8') as f:
+        raw = json.load(f)
+    for key, value in raw.items():
+        target = FLAT_KEYS.get(key)
+        if target is None:
+            if key == "password_requirements":
+                config[key].update(value)
+            else:
+                config[key] = value
+        elif len(target) == 1:
+            config[target[0]] = value
+        else:
+            config[target[0]][target[1]] = value
+    return config
+
+
+def axes_failure_limit(request, credentials):
+    """AXES_FAILURE_LIMIT callable so settings does not have to read the config file."""
+    return load_password_config().get("login_attempts", 3)
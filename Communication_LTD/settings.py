@@ -1,6 +1,5 @@
 from pathlib import Path
 import os
-import json
 
 # בסיס הפרויקט
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -13,9 +12,12 @@ DEBUG = True
 
 ALLOWED_HOSTS = []  # יש לעדכן את זה עם הדומיינים שלך בייצור
 
+# מצב הפעלה מהיר: טעינת האדמין (autodiscover) נדחית לבקשה הראשונה במקום בזמן עליית ה-worker
+LAZY_STARTUP = os.environ.get("DJANGO_LAZY_STARTUP", "0") == "1"
+
 # אפליקציות מותקנות
 INSTALLED_APPS = [
-    "django.contrib.admin",
+    "django.contrib.admin.apps.SimpleAdminConfig" if LAZY_STARTUP else "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
     "django.contrib.sessions",
@@ -28,6 +30,7 @@ INSTALLED_APPS = [
 # Middleware
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "users.middleware.StaticFilesMiddleware",  # קבצים סטטיים דחוסים עם cache ארוך
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -35,6 +38,9 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "axes.middleware.AxesMiddleware",  # הוספת AxesMiddleware
+    "users.middleware.DatabaseRoutingMiddleware",  # איפוס ניתוב primary/replica לכל בקשה
+    "users.middleware.AuditContextMiddleware",  # משתמש ו-IP לאירועי audit שנרשמים מ-signals
+    "users.middleware.RequestProfilerMiddleware",  # פרופיילר לבקשות נבחרות (כבוי כברירת מחדל)
 ]
 
 # כתובות URL הראשיות
@@ -69,8 +75,21 @@ DATABASES = {
     }
 }
 
+# רפליקות קריאה (למשל DATABASE_REPLICAS=replica1,replica2) - כל רפליקה היא קובץ SQLite נפרד מקומית
+DATABASE_REPLICAS = [alias for alias in os.environ.get("DATABASE_REPLICAS", "").split(",") if alias]
+for _alias in DATABASE_REPLICAS:
+    DATABASES[_alias] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / f"{_alias}.sqlite3",
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["users.routers.PrimaryReplicaRouter"]
+DATABASE_REPLICA_HEALTH_TTL = 30  # שניות בין בדיקות תקינות של רפליקה
+
 # מודל משתמש מותאם
 AUTH_USER_MODEL = 'users.User'
+AUTHENTICATION_BACKENDS = ["users.backends.ReplicaModelBackend"]  # חיפוש המשתמש ברפליקה, בדיקת סיסמה אחת
 
 # הגדרת אימייל - יש לעדכן עם הפרטים שלך
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -81,34 +100,15 @@ EMAIL_HOST_USER = 'your_email@communication_ltd.com'
 EMAIL_HOST_PASSWORD = 'your_email_password'
 DEFAULT_FROM_EMAIL = 'no-reply@communication_ltd.com'
 
-# טעינת קובץ קונפיגורציה לסיסמאות
+# קונפיגורציית הסיסמאות נטענת מהנתיב הזה בעצלות בשימוש הראשון -
+# ראו Communication_LTD/password_config.py; הולידטורים המותאמים קוראים ממנה בעצמם
 PASSWORD_CONFIG_PATH = BASE_DIR / 'password_config.json'
-if os.path.exists(PASSWORD_CONFIG_PATH):
-    with open(PASSWORD_CONFIG_PATH, 'r', encoding='utf-8') as f:
-        PASSWORD_CONFIG = json.load(f)
-else:
-    PASSWORD_CONFIG = {
-        "min_password_length": 10,
-        "password_requirements": {
-            "uppercase": True,
-            "lowercase": True,
-            "digits": True,
-            "special_characters": True
-        },
-        "password_history": 3,
-        "dictionary_check": True,
-        "login_attempts": 3
-    }
 
 # אבטחת סיסמאות לפי קובץ הקונפיגורציה
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
     },
-    {
-        "NAME": "django.contrib.auth.password_validation.MinimumLengthValidator",
-        "OPTIONS": {"min_length": PASSWORD_CONFIG.get("min_password_length", 10)},
-    },
     {
         "NAME": "django.contrib.auth.password_validation.CommonPasswordValidator",
     },
@@ -116,21 +116,11 @@ AUTH_PASSWORD_VALIDATORS = [
         "NAME": "django.contrib.auth.password_validation.NumericPasswordValidator",
     },
     {
+        # אורך מינימלי, סוגי תווים ובדיקת מילון - לפי password_config.json
         "NAME": "users.validators.CustomPasswordValidator",
-        "OPTIONS": {
-            "min_length": PASSWORD_CONFIG.get("min_password_length", 10),
-            "require_uppercase": PASSWORD_CONFIG["password_requirements"].get("uppercase", True),
-            "require_lowercase": PASSWORD_CONFIG["password_requirements"].get("lowercase", True),
-            "require_digits": PASSWORD_CONFIG["password_requirements"].get("digits", True),
-            "require_special_characters": PASSWORD_CONFIG["password_requirements"].get("special_characters", True),
-            "dictionary_check": PASSWORD_CONFIG.get("dictionary_check", True),
-        },
     },
     {
         "NAME": "users.validators.PasswordHistoryValidator",
-        "OPTIONS": {
-            "password_history": PASSWORD_CONFIG.get("password_history", 3),
-        },
     },
 ]
 
@@ -150,6 +140,15 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
 
+# collectstatic: שמות עם hash (manifest) + גרסאות gzip/brotli דחוסות מראש
+STATIC_ROOT = BASE_DIR / "staticfiles"
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "users.staticfiles.CompressedManifestStaticFilesStorage"},
+}
+STATIC_COMPRESS_MIN_SIZE = 256  # בתים
+STATIC_UNHASHED_MAX_AGE = 300  # שניות, לקבצים בלי hash בשם
+
 # הגדרות התחברות והתנתקות
 LOGIN_REDIRECT_URL = '/'  # דף הבית לאחר התחברות
 LOGOUT_REDIRECT_URL = 'login'  # מפנה לדף הלוגין לאחר התנתקות
@@ -157,8 +156,42 @@ LOGOUT_REDIRECT_URL = 'login'  # מפנה לדף הלוגין לאחר התנת
 # אוטומטית שדה ראשי
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# פרופיילר בקשות - תיקיית הלכידות ומספר הלכידות המקסימלי שנשמר
+REQUEST_PROFILER_DIR = BASE_DIR / "profiles"
+REQUEST_PROFILER_MAX_CAPTURES = 20
+REQUEST_PROFILER_TRACEMALLOC_FRAMES = 10
+
+# יומן ביקורת (audit) - כתיבה באצוות ברקע; "file" (JSONL עם רוטציה) או "database"
+AUDIT_LOG_BACKEND = "file"
+AUDIT_LOG_FILE = BASE_DIR / "logs" / "audit.jsonl"
+AUDIT_LOG_MAX_BYTES = 10 * 1024 * 1024
+AUDIT_LOG_BACKUP_COUNT = 5
+AUDIT_BUFFER_SIZE = 10000  # מקסימום אירועים בזיכרון לפני השלכה
+AUDIT_DROP_POLICY = "drop_oldest"  # או "drop_newest"
+AUDIT_BATCH_SIZE = 200
+AUDIT_FLUSH_INTERVAL = 1.0  # שניות
+
+# פיד שינויי לקוחות (SSE) - תדירות בדיקה ומשך מקסימלי של חיבור
+# הזרם זמין רק בהרצה דרך ASGI (למשל uvicorn Communication_LTD.asgi:application)
+CHANGE_FEED_POLL_INTERVAL = 1.0
+CHANGE_FEED_STREAM_TIMEOUT = 60
+CHANGE_FEED_SAFETY_LAG = 5  # שניות; שינויים צעירים יותר מחכים - חייב להיות ארוך מהטרנזקציה הארוכה ביותר
+
+# מוני לוח הבקרה בדף הבית - זמן שמירה ב-cache בשניות
+DASHBOARD_STATS_TTL = 10
+DASHBOARD_COUNTER_FLUSH_INTERVAL = 5  # שניות בין כתיבות של דלתאות המונים מכל תהליך
+
+# יעדי זמן עלייה וזיכרון ל-worker (נבדקים ב-./manage.py startup_profile --check)
+STARTUP_TARGET_BOOT_SECONDS = 1.5
+STARTUP_TARGET_RSS_MB = 80
+
+# cache לדפי login/register/forgot-password לגולשים אנונימיים (מתבטל אוטומטית כשתבנית משתנה)
+ANON_PAGE_CACHE_ENABLED = True
+ANON_PAGE_CACHE_ALIAS = "default"
+ANON_PAGE_CACHE_TIMEOUT = 300  # שניות
+
 # הגדרות django-axes
-AXES_FAILURE_LIMIT = PASSWORD_CONFIG.get("login_attempts", 3)  # מספר הניסיונות המקסימלי
+AXES_FAILURE_LIMIT = "Communication_LTD.password_config.axes_failure_limit"  # login_attempts מהקונפיגורציה
 AXES_COOLOFF_TIME = 1  # זמן ההמתנה בשעות
 AXES_LOCKOUT_CALLABLE = 'axes.handlers.database.AxesDatabaseHandler'  # ניתן להתאים לפי הצורך
 
@@ -0,0 +1,22 @@
+# Communication_LTD/test_settings.py
+# הגדרות להרצת הטסטים (manage.py test בוחר בהן כברירת מחדל)
+import tempfile
+from pathlib import Path
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES
+
+# רפליקה נפרדת (לא MIRROR) כדי שהטסטים יוכלו ליצור פיגור בין primary לרפליקה.
+# לא נכנסת ל-DATABASE_REPLICAS - רק טסטים שמבקשים אותה מפעילים אותה עם override_settings
+TEST_REPLICA = 'replica_test'
+DATABASES = {
+    **DATABASES,
+    TEST_REPLICA: {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / f"{TEST_REPLICA}.sqlite3",
+    },
+}
+DATABASE_REPLICAS = []
+
+# ה-thread של ה-audit פעיל גם בטסטים (force_login שולח user_logged_in) - לא לכתוב ל-logs/ האמיתי
+AUDIT_LOG_FILE = Path(tempfile.gettempdir()) / "communication_ltd_tests" / "audit.jsonl"
@@ -1,9 +1,13 @@
 # Communication_LTD/urls.py
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
+# במצב LAZY_STARTUP האדמין לא נטען ב-ready(); ה-URLconf נטען רק בבקשה הראשונה
+if settings.LAZY_STARTUP:
+    admin.autodiscover()
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('axes/', include('axes.urls')),  # הוספת נתיב של django-axes
     path('', include('users.urls')),      # נתיבים של האפליקציה users
 ]
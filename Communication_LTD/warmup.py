@@ -0,0 +1,42 @@
+"""
+Pre-fork warm-up for Communication_LTD workers.
+
+With a preloading server (e.g. ``gunicorn --preload``) the master imports the
+WSGI module once and forks workers from it. Setting ``DJANGO_PRELOAD=1`` makes
+``wsgi.py``/``asgi.py`` call :func:`warm_up` in the master so the URLconf,
+password policy, validator dictionaries and templates are loaded before the
+fork and shared copy-on-write by every worker.
+"""
+
+import gc
+
+WARM_TEMPLATES = [
+    'users/login.html',
+    'users/register.html',
+    'users/forgot_password.html',
+    'users/reset_password.html',
+    'users/home.html',
+]
+
+
+def warm_up():
+    """Load lazily-initialised state now, then freeze it out of the GC's reach."""
+    from django.contrib.auth.password_validation import get_default_password_validators
+    from django.template import TemplateDoesNotExist, TemplateSyntaxError
+    from django.template.loader import get_template
+    from django.urls import get_resolver
+
+    from Communication_LTD.password_config import load_password_config
+
+    load_password_config()
+    # CommonPasswordValidator קורא את רשימת הסיסמאות הנפוצות (~20K) ביצירה
+    get_default_password_validators()
+    get_resolver().url_patterns
+    for name in WARM_TEMPLATES:
+        try:
+            get_template(name)
+        except (TemplateDoesNotExist, TemplateSyntaxError):
+            pass
+    # gc.freeze מונע מה-GC לגעת באובייקטים של ה-master ולשכפל את הדפים אחרי fork
+    gc.collect()
+    gc.freeze()
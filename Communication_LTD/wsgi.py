@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "Communication_LTD.settings")
 
 application = get_wsgi_application()
+
+# DJANGO_PRELOAD=1 (למשל עם gunicorn --preload): טעינה מוקדמת לפני fork כדי לשתף זיכרון
+if os.environ.get("DJANGO_PRELOAD") == "1":
+    from Communication_LTD.warmup import warm_up
+
+    warm_up()
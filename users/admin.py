@@ -1,7 +1,137 @@
-from django.contrib import admin
+# users/admin.py
+from django.contrib import admin, messages
+from django.contrib.auth.hashers import make_password
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.text import smart_split, unescape_string_literal
+from .lookups import prefix_q
+from .models import User, Customer, AuditLogEntry
+from .routers import read_from_replica
+from . import stats
 
-# Register your models here.
-from django.contrib import admin
-from .models import User
+# מתחת לסף הזה עדיף לספור באמת (COUNT(*) על טבלה קטנה זול)
+ESTIMATED_COUNT_THRESHOLD = 10000
 
-admin.site.register(User)
+
+def estimated_row_count(model, using='default'):
+    """Return a cheap row estimate for the model's table, or None if unavailable."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+        elif connection.vendor == 'sqlite':
+            # MAX על המפתח הראשי נקרא מהאינדקס בלבד
+            pk = model._meta.pk.column
+            cursor.execute(f'SELECT MAX("{pk}") FROM "{table}"')
+        else:
+            return None
+        row = cursor.fetchone()
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that uses the planner estimate for unfiltered changelists."""
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimated_row_count(self.object_list.model, self.object_list.db)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    """Base admin for large tables: no full counts, deferred heavy columns, indexed prefix search.
+
+    Every name in `search_fields` is a plain indexed column; each search term
+    must be a (case-sensitive) prefix of at least one of them.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    changelist_defer = ()
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        match = getattr(request, 'resolver_match', None)
+        if self.changelist_defer and match and match.url_name and match.url_name.endswith('_changelist'):
+            queryset = queryset.defer(*self.changelist_defer)
+        return queryset
+
+    def get_search_results(self, request, queryset, search_term):
+        vendor = connections[queryset.db].vendor
+        for bit in smart_split(search_term):
+            if bit[0] in ('"', "'") and bit[-1] == bit[0]:
+                bit = unescape_string_literal(bit)
+            condition = Q()
+            for field in self.search_fields:
+                condition |= prefix_q(field, bit, vendor)
+            queryset = queryset.filter(condition)
+        return queryset, False
+
+    def changelist_view(self, request, extra_context=None):
+        # רשימות באדמין נקראות מהרפליקה; POST (פעולות) נשאר על ה-primary
+        if request.method == 'GET':
+            return read_from_replica(self._render_changelist, request, extra_context)
+        return super().changelist_view(request, extra_context)
+
+    def _render_changelist(self, request, extra_context):
+        response = super().changelist_view(request, extra_context)
+        # רינדור כאן כדי שהשאילתות העצלות ירוצו מול הרפליקה (ויחזרו ל-primary אם היא נכשלת)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+
+@admin.register(User)
+class UserAdmin(ScalableModelAdmin):
+    """Admin for the custom User model."""
+    list_display = ('username', 'email', 'is_active', 'is_admin', 'last_login')
+    list_filter = ('is_active', 'is_admin')
+    search_fields = ('username', 'email')
+    ordering = ('-id',)
+    changelist_defer = ('password', 'password_history', 'reset_token')
+    actions = ('deactivate_users', 'force_password_reset')
+
+    @admin.action(description="Deactivate selected users")
+    def deactivate_users(self, request, queryset):
+        updated = queryset.filter(is_active=True).update(is_active=False)
+        # update() עוקף signals - מעדכנים את מונה לוח הבקרה ידנית
+        stats.increment(stats.ACTIVE_USERS, -updated)
+        self.message_user(request, f"{updated} users deactivated.", messages.SUCCESS)
+
+    @admin.action(description="Force password reset for selected users")
+    def force_password_reset(self, request, queryset):
+        # סיסמה לא שמישה - המשתמש חייב לעבור דרך "שכחתי סיסמה"
+        updated = queryset.update(password=make_password(None), reset_token=None)
+        self.message_user(request, f"{updated} users must now reset their password.", messages.SUCCESS)
+
+
+@admin.register(Customer)
+class CustomerAdmin(ScalableModelAdmin):
+    """Admin for customers."""
+    list_display = ('customer_id', 'firstname', 'lastname', 'email', 'phone_number')
+    search_fields = ('customer_id', 'email', 'phone_number')
+    ordering = ('-id',)
+
+
+@admin.register(AuditLogEntry)
+class AuditLogEntryAdmin(ScalableModelAdmin):
+    """Read-only view of the security audit table."""
+    list_display = ('created_at', 'event', 'username', 'ip_address')
+    list_filter = ('event',)
+    search_fields = ('username',)
+    ordering = ('-created_at',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,205 @@
+# users/audit.py
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+from django.conf import settings
+from django.db import close_old_connections
+
+try:
+    import fcntl
+except ImportError:  # Windows - אין נעילה בין תהליכים, רק בתוך התהליך
+    fcntl = None
+
+# צינור אירועי אבטחה: ה-views וה-signals רק דוחפים אירוע קטן לתור בזיכרון,
+# ו-thread ברקע כותב אותם באצוות לקובץ JSONL (עם רוטציה) או לטבלה (bulk_create)
+LOGIN_SUCCESS = 'login_success'
+LOGIN_FAILURE = 'login_failure'
+PASSWORD_CHANGE = 'password_change'
+PASSWORD_RESET_REQUEST = 'password_reset_request'
+PASSWORD_RESET_REDEEM = 'password_reset_redeem'
+CUSTOMER_CREATE = 'customer_create'
+
+# הבקשה הנוכחית - כדי שאירועים מ-signals (למשל לקוח שנוצר ב-admin) יקבלו משתמש ו-IP
+_current_request = contextvars.ContextVar('audit_request', default=None)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class AuditPipeline:
+    """Bounded in-process buffer of audit events with a background batch writer."""
+
+    def __init__(self):
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.counters = {'enqueued': 0, 'flushed': 0, 'dropped': 0, 'failed_flushes': 0}
+
+    def record(self, event, username='', ip=None, **details):
+        """Queue one event; never blocks and never touches the database."""
+        entry = {
+            'ts': time.time(),
+            'event': event,
+            'username': username or '',
+            'ip': ip,
+            'details': details,
+        }
+        capacity = _setting('AUDIT_BUFFER_SIZE', 10000)
+        with self._lock:
+            if len(self._buffer) >= capacity:
+                self.counters['dropped'] += 1
+                if _setting('AUDIT_DROP_POLICY', 'drop_oldest') == 'drop_newest':
+                    return
+                self._buffer.popleft()
+            self._buffer.append(entry)
+            self.counters['enqueued'] += 1
+            pending = len(self._buffer)
+        self._ensure_writer()
+        if pending >= _setting('AUDIT_BATCH_SIZE', 200):
+            self._wakeup.set()
+
+    def stats(self):
+        """Counters plus the number of events waiting to be flushed."""
+        with self._lock:
+            return {**self.counters, 'pending': len(self._buffer)}
+
+    def flush(self):
+        """Write everything currently buffered. Returns the number of events written."""
+        with self._lock:
+            batch = list(self._buffer)
+            self._buffer.clear()
+        if not batch:
+            return 0
+        try:
+            if _setting('AUDIT_LOG_BACKEND', 'file') == 'database':
+                _write_database(batch)
+            else:
+                _write_file(batch)
+        except Exception:
+            # האירועים אבדו - נספרים כ-dropped כדי שיופיעו במונים
+            with self._lock:
+                self.counters['failed_flushes'] += 1
+                self.counters['dropped'] += len(batch)
+            return 0
+        with self._lock:
+            self.counters['flushed'] += len(batch)
+        return len(batch)
+
+    def _ensure_writer(self):
+        # אחרי fork ה-thread של תהליך האב לא קיים - מפעילים חדש
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        interval = _setting('AUDIT_FLUSH_INTERVAL', 1.0)
+        while True:
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            self.flush()
+            close_old_connections()
+
+
+def _write_file(batch):
+    path = Path(_setting('AUDIT_LOG_FILE', Path(settings.BASE_DIR) / 'logs' / 'audit.jsonl'))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lines = ''.join(json.dumps(entry, separators=(',', ':'), default=str) + '\n' for entry in batch)
+    # כמה workers כותבים לאותו קובץ: הבדיקה, הרוטציה והכתיבה תחת נעילה אחת,
+    # אחרת שני תהליכים מסובבים יחד ואירועים נכתבים לקובץ שכבר הועבר/נמחק
+    with _file_lock(path):
+        _rotate_if_needed(path)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive flock on `<path>.lock`, shared by every process writing `path`."""
+    # סגירת הקובץ משחררת את ה-flock
+    with open(path.with_name(f'{path.name}.lock'), 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def _rotate_if_needed(path):
+    max_bytes = _setting('AUDIT_LOG_MAX_BYTES', 10 * 1024 * 1024)
+    backups = _setting('AUDIT_LOG_BACKUP_COUNT', 5)
+    try:
+        if path.stat().st_size < max_bytes:
+            return
+    except FileNotFoundError:
+        return
+    # audit.jsonl -> audit.jsonl.1 -> audit.jsonl.2 ... הישן ביותר נמחק
+    for index in range(backups - 1, 0, -1):
+        source = path.with_name(f'{path.name}.{index}')
+        if source.exists():
+            os.replace(source, path.with_name(f'{path.name}.{index + 1}'))
+    if backups > 0:
+        os.replace(path, path.with_name(f'{path.name}.1'))
+    else:
+        path.unlink()
+
+
+def _write_database(batch):
+    from .models import AuditLogEntry
+    AuditLogEntry.objects.bulk_create(
+        [
+            AuditLogEntry(
+                event=entry['event'],
+                username=entry['username'][:50],
+                ip_address=entry['ip'],
+                created_at=datetime.fromtimestamp(entry['ts'], tz=dt_timezone.utc),
+                details=entry['details'],
+            )
+            for entry in batch
+        ],
+        batch_size=_setting('AUDIT_BATCH_SIZE', 200),
+    )
+
+
+@contextmanager
+def request_scope(request):
+    """Make `request` the source of current_actor() for the duration of the block."""
+    token = _current_request.set(request)
+    try:
+        yield
+    finally:
+        _current_request.reset(token)
+
+
+def current_actor():
+    """(username, ip) of the request being handled, or ('', None) outside a request."""
+    request = _current_request.get()
+    if request is None:
+        return '', None
+    user = getattr(request, 'user', None)
+    username = user.get_username() if user is not None and user.is_authenticated else ''
+    return username, client_ip(request)
+
+
+def client_ip(request):
+    """Best-effort client address for an audit event."""
+    if request is None:
+        return None
+    return request.META.get('REMOTE_ADDR') or None
+
+
+pipeline = AuditPipeline()
+record = pipeline.record
+atexit.register(pipeline.flush)
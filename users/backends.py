@@ -0,0 +1,47 @@
+# users/backends.py
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from .routers import PRIMARY_DB, read_from_replica, replica_aliases
+
+UserModel = get_user_model()
+
+
+class ReplicaModelBackend(ModelBackend):
+    """ModelBackend that looks the user up on a replica and confirms the password hash against the primary."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        user = self.get_user_by_natural_key(username)
+        if user is None:
+            return None
+        valid = user.check_password(password)
+        if user._state.db != PRIMARY_DB and (not valid or not self._password_is_current(user)):
+            # הרפליקה עשויה להחזיק hash ישן (מיד אחרי איפוס/שינוי סיסמה) - מאמתים שוב מול ה-primary
+            user = self._get_from_primary(username)
+            valid = user is not None and user.check_password(password)
+        if valid and self.user_can_authenticate(user):
+            return user
+        return None
+
+    def get_user_by_natural_key(self, username):
+        """Replica first; the primary only when the row is missing (e.g. registered a moment ago)."""
+        if replica_aliases():
+            try:
+                return read_from_replica(UserModel._default_manager.get_by_natural_key, username)
+            except UserModel.DoesNotExist:
+                pass
+        return self._get_from_primary(username)
+
+    def _password_is_current(self, user):
+        """Whether the primary still stores the hash the replica returned (an indexed read, no hashing)."""
+        primary = UserModel._default_manager.db_manager(PRIMARY_DB)
+        return primary.filter(pk=user.pk, password=user.password).exists()
+
+    def _get_from_primary(self, username):
+        try:
+            return UserModel._default_manager.db_manager(PRIMARY_DB).get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            return None
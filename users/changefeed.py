@@ -0,0 +1,60 @@
+# users/changefeed.py
+import asyncio
+import json
+import time
+from datetime import timedelta
+from itertools import takewhile
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from .models import CustomerChange
+from .routers import PRIMARY_DB
+
+# פיד שינויים של לקוחות: הצרכנים שומרים את ה-cursor האחרון ומושכים רק מה שאחריו
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def changes_after(cursor, limit=DEFAULT_PAGE_SIZE):
+    """Return (changes, next_cursor, has_more) for settled entries with pk > cursor.
+
+    An id is taken when the row is inserted but becomes visible only at
+    commit, so a later id can be read while an earlier one is still in
+    flight; advancing the cursor past it would skip it for good. Entries
+    younger than CHANGE_FEED_SAFETY_LAG seconds are therefore held back,
+    together with everything after them. The lag must be longer than the
+    longest transaction that writes customers.
+
+    The feed is always read from the primary: on a lagging replica a later
+    id can be visible, and older than the cutoff, while an earlier one is
+    not applied yet, and no lag setting bounds replication delay.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'CHANGE_FEED_SAFETY_LAG', 5))
+    # limit + 1 כדי לדעת אם יש עוד עמוד בלי COUNT
+    rows = list(CustomerChange.objects.using(PRIMARY_DB).filter(pk__gt=cursor).order_by('pk')[:limit + 1])
+    rows = list(takewhile(lambda row: row.changed_at <= cutoff, rows))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = rows[-1].pk if rows else cursor
+    return [row.as_dict() for row in rows], next_cursor, has_more
+
+
+async def stream_changes(cursor):
+    """Yield server-sent events for new changes, polling until the stream times out.
+
+    Async so that an open stream costs an event-loop task rather than a
+    worker thread; it must be served by ASGI (see customer_changes_stream).
+    """
+    poll_interval = getattr(settings, 'CHANGE_FEED_POLL_INTERVAL', 1.0)
+    deadline = time.monotonic() + getattr(settings, 'CHANGE_FEED_STREAM_TIMEOUT', 60)
+    # retry: הדפדפן/הצרכן מתחבר מחדש אוטומטית עם Last-Event-ID
+    yield f"retry: {int(poll_interval * 1000)}\n\n"
+    while time.monotonic() < deadline:
+        changes, cursor, has_more = await sync_to_async(changes_after)(cursor)
+        for change in changes:
+            yield f"id: {change['cursor']}\nevent: change\ndata: {json.dumps(change)}\n\n"
+        if not has_more:
+            if not changes:
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(poll_interval)
@@ -0,0 +1,77 @@
+# users/dedupe.py
+from django.db.models import Q
+from .models import Customer
+from .normalize import canonical_email, normalize_phone
+
+# זיהוי לקוחות כפולים לפי מפתחות מנורמלים ומאונדקסים:
+# ביצירה/ייבוא - שאילתה אחת על האינדקסים; באצווה - blocking לפי מפתח + union-find
+BLOCKING_FIELDS = ('email_canonical', 'phone_digits')
+CLUSTER_CHUNK_SIZE = 5000
+
+
+def find_duplicate_customer(email_key, phone_key, exclude_pk=None):
+    """Return an existing customer sharing the canonical email or phone, or None."""
+    condition = Q()
+    if email_key:
+        condition |= Q(email_canonical=email_key)
+    if phone_key:
+        condition |= Q(phone_digits=phone_key)
+    if not condition:
+        return None
+    queryset = Customer.objects.filter(condition)
+    if exclude_pk is not None:
+        queryset = queryset.exclude(pk=exclude_pk)
+    return queryset.only('pk', 'customer_id').first()
+
+
+def find_duplicate_for(email, phone_number, exclude_pk=None):
+    """Same as find_duplicate_customer, for raw (un-normalised) import values."""
+    return find_duplicate_customer(canonical_email(email), normalize_phone(phone_number), exclude_pk)
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        root = self.parent.setdefault(item, item)
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # דחיסת מסלול - בלי רקורסיה כדי לא להיתקע על שרשראות ארוכות
+        while item != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            # השורש הוא תמיד ה-pk הקטן - הלקוח הוותיק באשכול
+            if root_b < root_a:
+                root_a, root_b = root_b, root_a
+            self.parent[root_b] = root_a
+
+
+def cluster_duplicates(fields=BLOCKING_FIELDS, chunk_size=CLUSTER_CHUNK_SIZE):
+    """Group customers that share any blocking key. Returns a list of sorted pk lists (size >= 2).
+
+    Each field is streamed once in key order (an index scan), and equal
+    neighbours are unioned, so the whole pass is O(n log n) at worst.
+    """
+    union_find = _UnionFind()
+    for field in fields:
+        previous_key = previous_pk = None
+        rows = (
+            Customer.objects.exclude(**{field: ''})
+            .order_by(field, 'pk')
+            .values_list(field, 'pk')
+            .iterator(chunk_size=chunk_size)
+        )
+        for key, pk in rows:
+            if key == previous_key:
+                union_find.union(previous_pk, pk)
+            previous_key, previous_pk = key, pk
+
+    clusters = {}
+    for pk in list(union_find.parent):
+        clusters.setdefault(union_find.find(pk), []).append(pk)
+    return sorted((sorted(members) for members in clusters.values() if len(members) > 1), key=lambda c: c[0])
@@ -0,0 +1,29 @@
+# users/lookups.py
+from django.db.models import Q
+
+
+def prefix_upper_bound(term):
+    """Smallest string greater than every string starting with `term` (None if there is none)."""
+    for i in range(len(term) - 1, -1, -1):
+        if ord(term[i]) < 0x10FFFF:
+            return term[:i] + chr(ord(term[i]) + 1)
+    return None
+
+
+def prefix_q(field, term, vendor):
+    """Case-sensitive "field starts with term" that the field's b-tree index can serve.
+
+    SQLite plans `LIKE ... ESCAPE` (what __startswith compiles to) as a full
+    scan, so there we use the equivalent range field >= term AND field < bound.
+    On PostgreSQL __startswith is kept: Django creates a varchar_pattern_ops
+    ("_like") index next to every unique/db_index varchar column, and LIKE
+    'term%' uses it under any collation, which a range on a non-C collation
+    does not guarantee.
+    """
+    if vendor != 'sqlite':
+        return Q(**{f'{field}__startswith': term})
+    condition = Q(**{f'{field}__gte': term})
+    upper = prefix_upper_bound(term)
+    if upper is not None:
+        condition &= Q(**{f'{field}__lt': upper})
+    return condition
@@ -0,0 +1,53 @@
+# users/management/commands/find_duplicate_customers.py
+import json
+from django.core.management.base import BaseCommand
+from users.dedupe import BLOCKING_FIELDS, cluster_duplicates
+from users.models import Customer
+
+# כמה pk נשלפים בשאילתה אחת (מתחת למגבלת הפרמטרים של SQLite)
+FETCH_BATCH_SIZE = 500
+CUSTOMER_FIELDS = ('pk', 'customer_id', 'firstname', 'lastname', 'email', 'phone_number')
+
+
+def _cluster_batches(clusters, batch_size):
+    """Group whole clusters into batches of roughly `batch_size` pks."""
+    batch, size = [], 0
+    for members in clusters:
+        if batch and size + len(members) > batch_size:
+            yield batch
+            batch, size = [], 0
+        batch.append(members)
+        size += len(members)
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = "Cluster existing customers that share a canonical email or phone (optionally folded name)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--by-name', action='store_true',
+                            help="Also treat an identical folded name as a match (more false positives).")
+        parser.add_argument('--json', action='store_true', help="Print clusters as JSON lines.")
+
+    def handle(self, *args, **options):
+        fields = BLOCKING_FIELDS + (('name_key',) if options['by_name'] else ())
+        clusters = cluster_duplicates(fields)
+        for batch in _cluster_batches(clusters, FETCH_BATCH_SIZE):
+            pks = [pk for members in batch for pk in members]
+            rows = {row['pk']: row for row in Customer.objects.filter(pk__in=pks).values(*CUSTOMER_FIELDS)}
+            for members in batch:
+                self._write_cluster([rows[pk] for pk in members if pk in rows], options['json'])
+        if not options['json']:
+            self.stdout.write(self.style.SUCCESS(f"{len(clusters)} duplicate clusters found."))
+
+    def _write_cluster(self, customers, as_json):
+        if as_json:
+            self.stdout.write(json.dumps(customers))
+            return
+        self.stdout.write(f"Cluster of {len(customers)}:")
+        for customer in customers:
+            self.stdout.write(
+                f"  #{customer['pk']} {customer['customer_id']} {customer['firstname']} {customer['lastname']} "
+                f"<{customer['email']}> {customer['phone_number']}"
+            )
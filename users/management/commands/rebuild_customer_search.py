@@ -0,0 +1,16 @@
+# users/management/commands/rebuild_customer_search.py
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from users.search import rebuild_search_index, REBUILD_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Rebuild the customer full-text search index from the users_customer table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help="Database alias to rebuild.")
+        parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE, help="Rows per insert batch.")
+
+    def handle(self, *args, **options):
+        indexed = rebuild_search_index(using=options['database'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} customers."))
@@ -0,0 +1,11 @@
+# users/management/commands/reconcile_dashboard_stats.py
+from django.core.management.base import BaseCommand
+from users.stats import reconcile, dashboard_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the home dashboard counters with exact counts (run periodically, e.g. from cron)."
+
+    def handle(self, *args, **options):
+        reconcile()
+        self.stdout.write(self.style.SUCCESS(f"Dashboard counters reconciled: {dashboard_stats()}"))
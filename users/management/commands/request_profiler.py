@@ -0,0 +1,26 @@
+# users/management/commands/request_profiler.py
+from django.core.management.base import BaseCommand
+from users import profiling
+
+
+class Command(BaseCommand):
+    help = "Arm, disarm or inspect the on-demand request profiler."
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['arm', 'disarm', 'status'])
+        parser.add_argument('--path', action='append', dest='paths', help="Path prefix to profile (repeatable).")
+        parser.add_argument('--sample-rate', type=float, default=1.0, help="Fraction of matching requests to capture.")
+        parser.add_argument('--minutes', type=float, default=5, help="How long the profiler stays armed.")
+
+    def handle(self, *args, **options):
+        if options['action'] == 'arm':
+            paths = options['paths'] or ['/register/', '/change-password/']
+            config = profiling.arm(paths, sample_rate=options['sample_rate'], duration=options['minutes'] * 60)
+            self.stdout.write(self.style.SUCCESS(f"Profiler armed: {config}"))
+        elif options['action'] == 'disarm':
+            profiling.disarm()
+            self.stdout.write(self.style.SUCCESS("Profiler disarmed."))
+        else:
+            self.stdout.write(f"Armed: {profiling.current_arming()}")
+            for name in profiling.list_captures():
+                self.stdout.write(name)
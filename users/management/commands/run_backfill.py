@@ -0,0 +1,47 @@
+# users/management/commands/run_backfill.py
+from django.core.management.base import BaseCommand, CommandError
+from users.backfill import REGISTRY, BackfillLocked, run_backfill
+
+
+class Command(BaseCommand):
+    help = "Run a registered backfill in primary-key chunks, resuming from its checkpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', nargs='?', help="Backfill to run (omit to list them).")
+        parser.add_argument('--chunk-size', type=int, help="Rows per chunk (default: the backfill's own).")
+        parser.add_argument('--sleep', type=float, default=0.1, help="Pause between chunks, in seconds.")
+        parser.add_argument('--max-chunk-seconds', type=float, default=2.0,
+                            help="Halve the chunk size when a chunk takes longer than this.")
+        parser.add_argument('--max-chunks', type=int, help="Stop after this many chunks (resume later).")
+        parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint and start over.")
+
+    def handle(self, *args, **options):
+        if not options['name']:
+            for name, backfill in sorted(REGISTRY.items()):
+                self.stdout.write(f"{name}: {backfill.__doc__}")
+            return
+        if options['name'] not in REGISTRY:
+            raise CommandError(f"Unknown backfill '{options['name']}'. Available: {', '.join(sorted(REGISTRY))}")
+
+        def progress(checkpoint, max_pk, elapsed):
+            percent = 100.0 * checkpoint.last_pk / max_pk if max_pk else 100.0
+            self.stdout.write(
+                f"{checkpoint.name}: pk {checkpoint.last_pk}/{max_pk} ({percent:.1f}%), "
+                f"{checkpoint.rows_processed} processed, {checkpoint.rows_changed} changed, "
+                f"last chunk {elapsed:.2f}s"
+            )
+
+        try:
+            checkpoint = run_backfill(
+                REGISTRY[options['name']](),
+                chunk_size=options['chunk_size'],
+                sleep=options['sleep'],
+                max_chunk_seconds=options['max_chunk_seconds'],
+                restart=options['restart'],
+                max_chunks=options['max_chunks'],
+                progress=progress,
+            )
+        except BackfillLocked as exc:
+            raise CommandError(str(exc))
+        status = "completed" if checkpoint.completed_at else "paused"
+        self.stdout.write(self.style.SUCCESS(f"{checkpoint.name} {status} at pk {checkpoint.last_pk}."))
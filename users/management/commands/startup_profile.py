@@ -0,0 +1,81 @@
+# users/management/commands/startup_profile.py
+import json
+import os
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# רץ בתהליך נפרד (כמו worker חדש): טוען את מודול ה-WSGI/ASGI ומדווח זמן וזיכרון
+CHILD_SCRIPT = """
+import json, resource, sys, time
+started = time.perf_counter()
+import importlib
+importlib.import_module(sys.argv[1])
+boot = time.perf_counter() - started
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"boot_seconds": boot, "rss_mb": rss_kb / 1024}))
+"""
+
+
+def parse_importtime(stderr):
+    """Parse `python -X importtime` output into (cumulative_us, self_us, module) tuples."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, module = line[len('import time:'):].split('|', 2)
+            rows.append((int(cumulative_us), int(self_us), module.rstrip()))
+        except ValueError:
+            continue
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Profile worker boot: import times, boot seconds and RSS of a fresh WSGI/ASGI process."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', default='Communication_LTD.wsgi',
+                            help="Entry module to import (Communication_LTD.wsgi or Communication_LTD.asgi).")
+        parser.add_argument('--top', type=int, default=25, help="Number of slowest imports to show.")
+        parser.add_argument('--lazy', action='store_true', help="Boot with DJANGO_LAZY_STARTUP=1.")
+        parser.add_argument('--preload', action='store_true', help="Boot with DJANGO_PRELOAD=1 (warm-up included).")
+        parser.add_argument('--check', action='store_true',
+                            help="Fail if STARTUP_TARGET_BOOT_SECONDS / STARTUP_TARGET_RSS_MB are exceeded.")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'Communication_LTD.settings')
+        if options['lazy']:
+            env['DJANGO_LAZY_STARTUP'] = '1'
+        if options['preload']:
+            env['DJANGO_PRELOAD'] = '1'
+
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHILD_SCRIPT, options['module']],
+            capture_output=True, text=True, env=env, cwd=str(settings.BASE_DIR),
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Boot failed:\n{result.stderr[-2000:]}")
+        measured = json.loads(result.stdout.strip().splitlines()[-1])
+
+        self.stdout.write(f"{'cumulative ms':>14} {'self ms':>9}  module")
+        for cumulative_us, self_us, module in sorted(parse_importtime(result.stderr), reverse=True)[:options['top']]:
+            self.stdout.write(f"{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {module}")
+
+        boot_target = getattr(settings, 'STARTUP_TARGET_BOOT_SECONDS', None)
+        rss_target = getattr(settings, 'STARTUP_TARGET_RSS_MB', None)
+        self.stdout.write(
+            f"\nBoot: {measured['boot_seconds']:.3f}s (target {boot_target}s), "
+            f"RSS: {measured['rss_mb']:.1f}MB (target {rss_target}MB)"
+        )
+        if options['check']:
+            failures = []
+            if boot_target is not None and measured['boot_seconds'] > boot_target:
+                failures.append(f"boot {measured['boot_seconds']:.3f}s > {boot_target}s")
+            if rss_target is not None and measured['rss_mb'] > rss_target:
+                failures.append(f"RSS {measured['rss_mb']:.1f}MB > {rss_target}MB")
+            if failures:
+                raise CommandError("Startup targets exceeded: " + ", ".join(failures))
+            self.stdout.write(self.style.SUCCESS("Startup targets met."))
@@ -0,0 +1,88 @@
+# users/middleware.py
+from django.conf import settings
+from django.http import FileResponse, HttpResponseNotAllowed
+from django.utils.cache import patch_vary_headers
+from . import audit
+from .profiling import should_profile, profile_call
+from .routers import request_routing_scope
+from .staticfiles import (
+    ENCODINGS, accepted_encodings, cache_control, content_type, find_static_file, forget_static_file,
+)
+
+
+class DatabaseRoutingMiddleware:
+    """Reset replica/sticky-primary routing state for every request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with request_routing_scope():
+            return self.get_response(request)
+
+
+class AuditContextMiddleware:
+    """Expose the current request to audit events recorded from signals."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with audit.request_scope(request):
+            return self.get_response(request)
+
+
+class RequestProfilerMiddleware:
+    """Capture cProfile + tracemalloc for sampled requests while the profiler is armed."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if should_profile(request.path):
+            return profile_call(request.path, self.get_response, request)
+        return self.get_response(request)
+
+
+class StaticFilesMiddleware:
+    """Serve collected static files with precompressed variants and long-lived cache headers."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else '/' + settings.STATIC_URL
+        self.enabled = bool(getattr(settings, 'STATIC_ROOT', None)) and getattr(settings, 'SERVE_STATIC', True)
+
+    def __call__(self, request):
+        if not self.enabled or not request.path.startswith(self.prefix):
+            return self.get_response(request)
+        name = request.path[len(self.prefix):]
+        path = find_static_file(name, '')
+        if path is None:
+            # לא נאסף (למשל בפיתוח) - ממשיכים ל-handler הרגיל של staticfiles
+            return self.get_response(request)
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        encoding = ''
+        for candidate, _suffix in ENCODINGS:
+            variant = find_static_file(name, candidate) if candidate in accepted else None
+            if variant:
+                path, encoding = variant, candidate
+                break
+        try:
+            file = open(path, 'rb')
+        except FileNotFoundError:
+            # collectstatic מחק את הקובץ אחרי שמיקומו נשמר
+            forget_static_file(name)
+            return self.get_response(request)
+
+        # FileResponse קובע את Content-Length מהקובץ שנפתח בפועל
+        response = FileResponse(file, content_type=content_type(name), filename=name)
+        response['Cache-Control'] = cache_control(name)
+        if encoding:
+            response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if request.method == 'HEAD':
+            response.streaming_content = []
+        return response
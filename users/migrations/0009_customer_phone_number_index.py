@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:09
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_sync_model_state'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customer',
+            name='phone_number',
+            field=models.CharField(db_index=True, max_length=10, validators=[django.core.validators.RegexValidator('^\\d{10}$', message='Phone number must be 10 digits.')]),
+        ),
+    ]
@@ -0,0 +1,62 @@
+from django.db import migrations
+
+# עותק קפוא של ההגדרות מ-users/search.py - migration לא מייבא קוד חי
+SEARCH_TABLE = 'users_customer_fts'
+SEARCH_FIELDS = ('firstname', 'lastname', 'email', 'phone_number')
+TRIGRAM_INDEX = 'users_customer_search_trgm'
+SEARCH_DOCUMENT = " || ' ' || ".join(SEARCH_FIELDS)
+BATCH_SIZE = 5000
+
+
+def create_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        # דורש הרשאה ל-CREATE EXTENSION (או שה-DBA יתקין את pg_trgm מראש)
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} "
+            f"ON users_customer USING GIN (({SEARCH_DOCUMENT}) gin_trgm_ops)"
+        )
+        return
+    if connection.vendor != 'sqlite':
+        return
+
+    # tokenizer מסוג trigram קיים רק מ-SQLite 3.34
+    tokenizer = 'trigram' if connection.Database.sqlite_version_info >= (3, 34, 0) else 'unicode61'
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+        f"USING fts5({', '.join(SEARCH_FIELDS)}, tokenize='{tokenizer}')"
+    )
+    Customer = apps.get_model('users', 'Customer')
+    customers = Customer.objects.using(connection.alias)
+    insert = (
+        f"INSERT INTO {SEARCH_TABLE} (rowid, {', '.join(SEARCH_FIELDS)}) "
+        f"VALUES (%s, {', '.join(['%s'] * len(SEARCH_FIELDS))})"
+    )
+    last_pk = 0
+    with connection.cursor() as cursor:
+        while True:
+            rows = list(customers.filter(pk__gt=last_pk).order_by('pk').values_list('pk', *SEARCH_FIELDS)[:BATCH_SIZE])
+            if not rows:
+                break
+            cursor.executemany(insert, rows)
+            last_pk = rows[-1][0]
+
+
+def drop_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP INDEX IF EXISTS {TRIGRAM_INDEX}")
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_customer_phone_number_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_customer_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(db_index=True, max_length=32)),
+                ('username', models.CharField(blank=True, max_length=50)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('details', models.JSONField(blank=True, default=dict)),
+            ],
+        ),
+    ]
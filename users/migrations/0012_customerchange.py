@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_auditlogentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('customer_pk', models.BigIntegerField(db_index=True)),
+                ('operation', models.CharField(choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')], max_length=6)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+                ('data', models.JSONField(blank=True, default=dict)),
+            ],
+        ),
+    ]
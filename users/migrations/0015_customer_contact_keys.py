@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0014_backfillcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='email_canonical',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='name_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=101),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='phone_digits',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=15),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0015_customer_contact_keys'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditlogentry',
+            name='username',
+            field=models.CharField(blank=True, db_index=True, max_length=50),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0016_auditlogentry_username_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backfillcheckpoint',
+            name='locked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='backfillcheckpoint',
+            name='locked_by',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+    ]
@@ -2,35 +2,14 @@ import os
 import hmac
 import hashlib
 import re
-import json
-from pathlib import Path
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
 from django.conf import settings
-
-# הגדרת הנתיב לקובץ קונפיגורציית הסיסמאות
-BASE_DIR = Path(__file__).resolve().parent.parent
-PASSWORD_CONFIG_PATH = BASE_DIR / 'password_config.json'
-
-# קריאת הגדרות הקונפיגורציה מקובץ JSON
-if PASSWORD_CONFIG_PATH.exists():
-    with open(PASSWORD_CONFIG_PATH, 'r', encoding='utf-8') as f:
-        config = json.load(f)
-else:
-    # הגדרות ברירת מחדל במקרה שהקובץ לא קיים
-    config = {
-        "min_password_length": 10,
-        "password_requirements": {
-            "uppercase": True,
-            "lowercase": True,
-            "digits": True,
-            "special_characters": True
-        },
-        "password_history": 3,
-        "dictionary_check": True
-    }
+from .normalize import EMAIL_KEY_LENGTH, NAME_KEY_LENGTH, canonical_email, fold_name, normalize_phone
+# קונפיגורציית הסיסמאות נטענת רק בשימוש הראשון (ולא בזמן import של המודלים)
+from Communication_LTD.password_config import load_password_config as config
 
 class UserManager(BaseUserManager):
     """Custom manager for User model."""
@@ -88,7 +67,7 @@ class User(AbstractBaseUser, PermissionsMixin):
             new_password = f'{salt}${hashed_password}'
 
             # Check if the new password matches the recent password history
-            recent_passwords = self.password_history[-config["password_history"]:]
+            recent_passwords = self.password_history[-config()["password_history"]:]
             for old_password in recent_passwords:
                 try:
                     old_salt, old_hash = old_password.split('$')
@@ -102,7 +81,7 @@ class User(AbstractBaseUser, PermissionsMixin):
             self.password = new_password
             self.password_history.append(new_password)
             # שמירה רק על מספר ההיסטוריה הנדרש
-            self.password_history = self.password_history[-config["password_history"]:]
+            self.password_history = self.password_history[-config()["password_history"]:]
     
     def check_password(self, raw_password):
         """Verify the user's password."""
@@ -117,23 +96,23 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     def validate_password_strength(self, password):
         """Ensure password meets all strength requirements."""
-        if len(password) < config["min_password_length"]:
-            raise ValidationError(f"Password must be at least {config['min_password_length']} characters long.")
+        if len(password) < config()["min_password_length"]:
+            raise ValidationError(f"Password must be at least {config()['min_password_length']} characters long.")
         
-        if config["password_requirements"].get("uppercase") and not any(c.isupper() for c in password):
+        if config()["password_requirements"].get("uppercase") and not any(c.isupper() for c in password):
             raise ValidationError("Password must contain at least one uppercase letter.")
         
-        if config["password_requirements"].get("lowercase") and not any(c.islower() for c in password):
+        if config()["password_requirements"].get("lowercase") and not any(c.islower() for c in password):
             raise ValidationError("Password must contain at least one lowercase letter.")
         
-        if config["password_requirements"].get("digits") and not any(c.isdigit() for c in password):
+        if config()["password_requirements"].get("digits") and not any(c.isdigit() for c in password):
             raise ValidationError("Password must contain at least one digit.")
         
-        if config["password_requirements"].get("special_characters") and not any(c in "!@#$%^&*(),.?\":{}|<>" for c in password):
+        if config()["password_requirements"].get("special_characters") and not any(c in "!@#$%^&*(),.?\":{}|<>" for c in password):
             raise ValidationError("Password must contain at least one special character.")
 
         # אם נדרש מניעת מילים מתוך מילון, נוכל לבדוק את הסיסמה במילון (תוכנית חיצונית או רשימה מוגדרת)
-        if config.get("dictionary_check"):
+        if config().get("dictionary_check"):
             # לדוגמה, נוודא שהסיסמה לא כוללת את המילים השכיחות ביותר:
             common_passwords = ["123456", "password", "qwerty"]  # דוגמה
             if password.lower() in common_passwords:
@@ -155,9 +134,95 @@ class Customer(models.Model):
     email = models.EmailField(max_length=100, unique=True)
     phone_number = models.CharField(
         max_length=10,
+        db_index=True,  # חיפוש לפי תחילית באדמין
         validators=[RegexValidator(r'^\d{10}$', message="Phone number must be 10 digits.")],
     )
+    # מפתחות מנורמלים לזיהוי כפילויות - מחושבים ב-save()
+    email_canonical = models.CharField(max_length=EMAIL_KEY_LENGTH, blank=True, default='', db_index=True, editable=False)
+    phone_digits = models.CharField(max_length=15, blank=True, default='', db_index=True, editable=False)
+    name_key = models.CharField(max_length=NAME_KEY_LENGTH, blank=True, default='', db_index=True, editable=False)
+
+    def contact_keys(self):
+        """Return (email_canonical, phone_digits, name_key) for the current field values."""
+        return (
+            canonical_email(self.email),
+            normalize_phone(self.phone_number),
+            fold_name(self.firstname, self.lastname),
+        )
+
+    def clean(self):
+        from .dedupe import find_duplicate_customer
+        email_key, phone_key, _name_key = self.contact_keys()
+        duplicate = find_duplicate_customer(email_key, phone_key, exclude_pk=self.pk)
+        if duplicate is not None:
+            raise ValidationError(
+                f"A customer with the same email or phone number already exists ({duplicate.customer_id})."
+            )
+
+    def save(self, *args, **kwargs):
+        self.email_canonical, self.phone_digits, self.name_key = self.contact_keys()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'email_canonical', 'phone_digits', 'name_key'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.firstname} {self.lastname}"
 
+
+class AuditLogEntry(models.Model):
+    """Append-only security audit event (written in batches by users.audit)."""
+    event = models.CharField(max_length=32, db_index=True)
+    username = models.CharField(max_length=50, blank=True, db_index=True)
+    ip_address = models.GenericIPAddressField(blank=True, null=True)
+    created_at = models.DateTimeField(db_index=True)
+    details = models.JSONField(default=dict, blank=True)
+
+    def __str__(self):
+        return f"{self.created_at} {self.event} {self.username}"
+
+class CustomerChange(models.Model):
+    """Append-only change log of Customer rows; the primary key is the sync cursor."""
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    OPERATION_CHOICES = [(CREATE, 'Create'), (UPDATE, 'Update'), (DELETE, 'Delete')]
+
+    customer_pk = models.BigIntegerField(db_index=True)
+    operation = models.CharField(max_length=6, choices=OPERATION_CHOICES)
+    changed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    data = models.JSONField(default=dict, blank=True)  # תמונת מצב של הלקוח אחרי השינוי
+
+    def as_dict(self):
+        return {
+            'cursor': self.pk,
+            'customer_pk': self.customer_pk,
+            'operation': self.operation,
+            'changed_at': self.changed_at.isoformat(),
+            'data': self.data,
+        }
+
+class DashboardCounter(models.Model):
+    """Named running total for the home dashboard (see users.stats)."""
+    name = models.CharField(max_length=64, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}={self.value}"
+
+class BackfillCheckpoint(models.Model):
+    """Resume point and progress of a chunked backfill (see users.backfill)."""
+    name = models.CharField(max_length=64, unique=True)
+    last_pk = models.BigIntegerField(default=0)
+    rows_processed = models.BigIntegerField(default=0)
+    rows_changed = models.BigIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    # "חכירה" של הריצה הנוכחית - מונעת שני runners במקביל; מתחדשת בכל מקטע
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_pk}"
@@ -0,0 +1,38 @@
+# users/normalize.py
+import re
+import unicodedata
+
+# מפתחות מנורמלים לזיהוי לקוחות כפולים (מייל קנוני, טלפון ספרות בלבד, שם מקופל)
+GMAIL_DOMAINS = ('gmail.com', 'googlemail.com')
+# אורך העמודות של המפתחות ב-Customer; lower/casefold/NFKD יכולים להאריך טקסט ('ß' -> 'ss')
+EMAIL_KEY_LENGTH = 100
+NAME_KEY_LENGTH = 101
+
+
+def normalize_phone(value):
+    """Digits only, with +972/972 turned into the local 0 prefix."""
+    digits = re.sub(r'\D', '', value or '')
+    if digits.startswith('972') and len(digits) == 12:
+        digits = '0' + digits[3:]
+    return digits
+
+
+def canonical_email(value):
+    """Lower-case email without +tags (and without dots for Gmail addresses), cut to the column length."""
+    email = (value or '').strip().lower()
+    local, sep, domain = email.rpartition('@')
+    if not sep:
+        return email[:EMAIL_KEY_LENGTH]
+    local = local.split('+', 1)[0]
+    if domain in GMAIL_DOMAINS:
+        local = local.replace('.', '')
+        domain = GMAIL_DOMAINS[0]
+    return f'{local}@{domain}'[:EMAIL_KEY_LENGTH]
+
+
+def fold_name(*parts):
+    """Accent-free, case-folded name tokens in sorted order ('Levi Dana' == 'dana LEVI'), cut to the column length."""
+    text = unicodedata.normalize('NFKD', ' '.join(part or '' for part in parts))
+    text = ''.join(char for char in text if not unicodedata.combining(char)).casefold()
+    tokens = re.findall(r'\w+', text)
+    return ' '.join(sorted(tokens))[:NAME_KEY_LENGTH]
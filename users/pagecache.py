@@ -0,0 +1,119 @@
+# users/pagecache.py
+import hashlib
+import re
+from functools import lru_cache, wraps
+from pathlib import Path
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.middleware.csrf import get_token
+from django.template import engines
+from django.utils.cache import patch_vary_headers
+from django.utils.http import quote_etag
+
+# Cache לדפים אנונימיים (login/register/forgot-password): ה-HTML זהה לכל המבקרים
+# מלבד טוקן ה-CSRF, לכן שומרים את הגוף עם placeholder ומזריקים טוקן טרי בכל הגשה
+CSRF_PLACEHOLDER = '__CSRF_TOKEN_PLACEHOLDER__'
+CSRF_INPUT_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")([^"]+)(")')
+
+
+def _template_files():
+    for engine in engines.all():
+        for directory in getattr(engine, 'template_dirs', ()):
+            directory = Path(directory)
+            if directory.is_dir():
+                yield from (path for path in directory.rglob('*') if path.is_file())
+
+
+def _compute_template_fingerprint():
+    digest = hashlib.sha1()
+    for path in sorted(_template_files()):
+        stat = path.stat()
+        digest.update(f'{path}:{stat.st_mtime_ns}:{stat.st_size}'.encode())
+    return digest.hexdigest()[:16]
+
+
+@lru_cache(maxsize=None)
+def _cached_template_fingerprint():
+    return _compute_template_fingerprint()
+
+
+def template_fingerprint():
+    """Hash of every template's path/mtime/size; a template change yields new cache keys."""
+    # בפיתוח תבניות משתנות בלי restart - מחשבים בכל בקשה
+    if settings.DEBUG:
+        return _compute_template_fingerprint()
+    return _cached_template_fingerprint()
+
+
+def _has_pending_messages(request):
+    # len() טוען את ההודעות בלי לסמן אותן כנקראו (רק איטרציה מסמנת)
+    return len(get_messages(request)) > 0
+
+
+def _is_cacheable_request(request):
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.GET
+        and not request.user.is_authenticated
+        and not _has_pending_messages(request)
+    )
+
+
+def _etag(entry, csrf_secret):
+    # הגוף שהדפדפן שמר מכיל טוקן שנגזר מה-secret שב-cookie - cookie אחר = עותק לא תקף
+    return quote_etag(hashlib.sha1(f'{entry["body_hash"]}:{csrf_secret}'.encode()).hexdigest())
+
+
+def _not_modified(request, entry):
+    # CsrfViewMiddleware שם ב-META את ה-secret מה-cookie; בלי cookie אין מה לאמת
+    csrf_secret = request.META.get('CSRF_COOKIE')
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not csrf_secret or not if_none_match:
+        return False
+    return _etag(entry, csrf_secret) in [tag.strip() for tag in if_none_match.split(',')]
+
+
+def _finalize(response, request, entry):
+    # If-Modified-Since לא יודע על החלפת cookie, לכן רק ETag ובלי Last-Modified
+    response['ETag'] = _etag(entry, request.META.get('CSRF_COOKIE', ''))
+    # הגוף מכיל טוקן אישי - אסור ל-cache משותף לשמור; הדפדפן מאמת מחדש (בקשה מותנית זולה)
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def cache_anonymous_page(view_func):
+    """Serve anonymous GETs of `view_func` from cache, re-injecting a fresh CSRF token."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not getattr(settings, 'ANON_PAGE_CACHE_ENABLED', True) or not _is_cacheable_request(request):
+            return view_func(request, *args, **kwargs)
+
+        cache = caches[getattr(settings, 'ANON_PAGE_CACHE_ALIAS', 'default')]
+        language = getattr(request, 'LANGUAGE_CODE', settings.LANGUAGE_CODE)
+        key = f'anonpage:{view_func.__module__}.{view_func.__name__}:{request.path}:{language}:{template_fingerprint()}'
+
+        entry = cache.get(key)
+        if entry is None:
+            response = view_func(request, *args, **kwargs)
+            if response.status_code != 200 or response.streaming or response.cookies:
+                return response
+            body = CSRF_INPUT_RE.sub(rf'\g<1>{CSRF_PLACEHOLDER}\g<3>', response.content.decode(response.charset))
+            entry = {
+                'body': body,
+                'content_type': response['Content-Type'],
+                'body_hash': hashlib.sha1(body.encode()).hexdigest(),
+            }
+            cache.set(key, entry, getattr(settings, 'ANON_PAGE_CACHE_TIMEOUT', 300))
+            return _finalize(response, request, entry)
+
+        if _not_modified(request, entry):
+            return _finalize(HttpResponseNotModified(), request, entry)
+        body = entry['body']
+        if CSRF_PLACEHOLDER in body:
+            body = body.replace(CSRF_PLACEHOLDER, get_token(request))
+        return _finalize(HttpResponse(body, content_type=entry['content_type']), request, entry)
+
+    return wrapper
@@ -0,0 +1,162 @@
+# users/profiling.py
+import cProfile
+import json
+import os
+import random
+import re
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from django.conf import settings
+
+# מצב ה"חימוש" נשמר בקובץ בתיקיית הפרופילים כדי שכל ה-workers יראו אותו,
+# ונבדק לכל היותר פעם ב-ARM_CHECK_INTERVAL שניות כך שכשהפרופיילר כבוי אין עלות
+ARM_FILE_NAME = 'armed.json'
+ARM_CHECK_INTERVAL = 2.0
+CAPTURE_NAME_RE = re.compile(r'^[\w.-]+\.(prof|tracemalloc)$')
+
+_capture_lock = threading.Lock()
+_arm_state = {'checked_at': 0.0, 'config': None}
+
+
+def profiler_dir():
+    """Directory holding the arm file and the capture ring buffer."""
+    return Path(getattr(settings, 'REQUEST_PROFILER_DIR', Path(settings.BASE_DIR) / 'profiles'))
+
+
+def max_captures():
+    return getattr(settings, 'REQUEST_PROFILER_MAX_CAPTURES', 20)
+
+
+def arm(paths, sample_rate=1.0, duration=300):
+    """Arm the profiler for `paths` (prefixes) at `sample_rate` for `duration` seconds."""
+    directory = profiler_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    config = {
+        'paths': list(paths),
+        'sample_rate': max(0.0, min(float(sample_rate), 1.0)),
+        'until': time.time() + duration,
+    }
+    tmp_path = directory / f'{ARM_FILE_NAME}.tmp'
+    tmp_path.write_text(json.dumps(config), encoding='utf-8')
+    os.replace(tmp_path, directory / ARM_FILE_NAME)
+    _arm_state['checked_at'] = 0.0
+    return config
+
+
+def disarm():
+    """Turn the profiler off for every worker."""
+    try:
+        (profiler_dir() / ARM_FILE_NAME).unlink()
+    except FileNotFoundError:
+        pass
+    _arm_state['checked_at'] = 0.0
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _parse_arming(text):
+    """Return the arm config stored in `text`, or None if it is not a valid one (treated as disarmed)."""
+    try:
+        config = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(config, dict):
+        return None
+    paths = config.get('paths')
+    if not isinstance(paths, list) or not all(isinstance(prefix, str) for prefix in paths):
+        return None
+    if not _is_number(config.get('sample_rate')) or not _is_number(config.get('until')):
+        return None
+    return config
+
+
+def current_arming():
+    """Return the active arm config or None (re-read at most every ARM_CHECK_INTERVAL seconds)."""
+    now = time.monotonic()
+    if now - _arm_state['checked_at'] >= ARM_CHECK_INTERVAL:
+        _arm_state['checked_at'] = now
+        try:
+            config = _parse_arming((profiler_dir() / ARM_FILE_NAME).read_text(encoding='utf-8'))
+        except (FileNotFoundError, UnicodeDecodeError):
+            config = None
+        _arm_state['config'] = config
+    config = _arm_state['config']
+    if config is None or config['until'] < time.time():
+        return None
+    return config
+
+
+def should_profile(path):
+    """Decide whether this request path is sampled."""
+    config = current_arming()
+    if config is None:
+        return False
+    if not any(path.startswith(prefix) for prefix in config['paths']):
+        return False
+    return random.random() < config['sample_rate']
+
+
+def profile_call(path, func, *args, **kwargs):
+    """Run `func` under cProfile + tracemalloc and store the capture; returns func's result."""
+    # רק לכידה אחת בכל פעם - tracemalloc ו-cProfile גלובליים לתהליך
+    if not _capture_lock.acquire(blocking=False):
+        return func(*args, **kwargs)
+    try:
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(getattr(settings, 'REQUEST_PROFILER_TRACEMALLOC_FRAMES', 10))
+        profiler = cProfile.Profile()
+        try:
+            result = profiler.runcall(func, *args, **kwargs)
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+            _store_capture(path, profiler, snapshot)
+        return result
+    finally:
+        _capture_lock.release()
+
+
+def _store_capture(path, profiler, snapshot):
+    directory = profiler_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    slug = re.sub(r'[^\w-]+', '_', path.strip('/')) or 'root'
+    stem = f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{int(time.time() * 1000) % 1000:03d}-{slug}'
+    profiler.dump_stats(str(directory / f'{stem}.prof'))
+    snapshot.dump(str(directory / f'{stem}.tracemalloc'))
+    _trim_captures(directory)
+
+
+def _trim_captures(directory):
+    # Ring buffer: מוחקים את הלכידות הישנות ביותר מעבר למקסימום
+    stems = sorted({path.stem for path in directory.glob('*.prof')})
+    for stem in stems[:max(0, len(stems) - max_captures())]:
+        for suffix in ('.prof', '.tracemalloc'):
+            try:
+                (directory / f'{stem}{suffix}').unlink()
+            except FileNotFoundError:
+                pass
+
+
+def list_captures():
+    """Return capture file names, newest first."""
+    directory = profiler_dir()
+    if not directory.exists():
+        return []
+    return sorted(
+        (path.name for path in directory.iterdir() if CAPTURE_NAME_RE.match(path.name)),
+        reverse=True,
+    )
+
+
+def capture_path(name):
+    """Resolve a capture name to its file, or None if it is not a valid capture."""
+    if not CAPTURE_NAME_RE.match(name):
+        return None
+    path = profiler_dir() / name
+    return path if path.is_file() else None
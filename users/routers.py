@@ -0,0 +1,145 @@
+# users/routers.py
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.utils import DatabaseError
+
+PRIMARY_DB = 'default'
+
+# בדיקת תקינות של רפליקה נשמרת למספר שניות כדי לא לבדוק בכל שאילתה
+REPLICA_HEALTH_TTL = getattr(settings, 'DATABASE_REPLICA_HEALTH_TTL', 30)
+
+# האם הקוד הנוכחי ביקש במפורש לקרוא מרפליקה
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+# אחרי כתיבה - כל שאר הבקשה נשארת על ה-primary
+_pinned_to_primary = contextvars.ContextVar('pinned_to_primary', default=False)
+# הרפליקות שנבחרו בתוך read_from_replica - כדי לדעת את מי להוציא מהסבב אם נכשלה
+_replicas_used = contextvars.ContextVar('replicas_used', default=None)
+
+_replica_health = {}
+
+
+def replica_aliases():
+    """Return the configured replica database aliases."""
+    return [alias for alias in getattr(settings, 'DATABASE_REPLICAS', []) if alias in connections.settings]
+
+
+def is_replica_healthy(alias):
+    """Check (and cache for REPLICA_HEALTH_TTL seconds) whether a replica serves the user table."""
+    now = time.monotonic()
+    healthy, checked_at = _replica_health.get(alias, (None, 0.0))
+    if healthy is None or now - checked_at > REPLICA_HEALTH_TTL:
+        connection = connections[alias]
+        # SELECT 1 מצליח גם על קובץ SQLite ריק/חסר - בודקים טבלה אמיתית
+        table = connection.ops.quote_name(get_user_model()._meta.db_table)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT 1 FROM {table} LIMIT 1")
+            healthy = True
+        except DatabaseError:
+            healthy = False
+        _replica_health[alias] = (healthy, now)
+    return healthy
+
+
+def mark_replica_unhealthy(alias):
+    """Take a replica out of rotation until the next health check."""
+    _replica_health[alias] = (False, time.monotonic())
+
+
+def pick_replica():
+    """Return a healthy replica alias, falling back to the primary."""
+    candidates = [alias for alias in replica_aliases() if is_replica_healthy(alias)]
+    if not candidates:
+        return PRIMARY_DB
+    alias = random.choice(candidates)
+    used = _replicas_used.get()
+    if used is not None:
+        used.add(alias)
+    return alias
+
+
+@contextmanager
+def replica_reads():
+    """Allow reads inside the block to go to a replica (unless pinned to primary)."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """Force reads inside the block to the primary (read-after-write paths)."""
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def read_from_replica(func, *args, **kwargs):
+    """Call func with replica reads; if a replica fails, take it out of rotation and rerun on the primary.
+
+    `func` must do all of its reads itself (evaluate querysets, render
+    templates) so that a failure surfaces here and not after the call.
+    """
+    used = set()
+    used_token = _replicas_used.set(used)
+    try:
+        with replica_reads():
+            return func(*args, **kwargs)
+    except DatabaseError:
+        if not used:
+            raise
+        for alias in used:
+            mark_replica_unhealthy(alias)
+    finally:
+        _replicas_used.reset(used_token)
+    with primary_reads():
+        return func(*args, **kwargs)
+
+
+def pin_to_primary():
+    """Send every following read in this request to the primary."""
+    _pinned_to_primary.set(True)
+
+
+@contextmanager
+def request_routing_scope():
+    """Start a request with clean routing state and restore it afterwards."""
+    replica_token = _replica_reads.set(False)
+    pinned_token = _pinned_to_primary.set(False)
+    try:
+        yield
+    finally:
+        _pinned_to_primary.reset(pinned_token)
+        _replica_reads.reset(replica_token)
+
+
+class PrimaryReplicaRouter:
+    """Route opted-in reads to replicas, everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or _pinned_to_primary.get():
+            return PRIMARY_DB
+        return pick_replica()
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return PRIMARY_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY_DB, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # מאפשר migrate --database <replica> לבדיקה מקומית עם קבצי SQLite
+        return True
@@ -0,0 +1,188 @@
+# users/search.py
+import logging
+from django.db import OperationalError, connections
+from django.db.models import Q
+from .lookups import prefix_q
+from .models import Customer
+
+# אינדקס טקסט מלא ללקוחות:
+# SQLite - טבלת FTS5 עם tokenizer מסוג trigram (חיפוש תת-מחרוזות בשמות, מייל וטלפון);
+#          trigram קיים רק מ-SQLite 3.34 - בגרסאות ישנות יותר unicode61 וחיפוש לפי תחילית מילה
+# PostgreSQL - אינדקס GIN עם gin_trgm_ops (pg_trgm) על מסמך החיפוש; ILIKE '%term%' משתמש בו
+SEARCH_TABLE = 'users_customer_fts'
+SEARCH_FIELDS = ('firstname', 'lastname', 'email', 'phone_number')
+TRIGRAM_INDEX = 'users_customer_search_trgm'
+# הביטוי חייב להיות זהה לזה שבאינדקס (migration 0010) כדי שהמתכנן ישתמש בו
+SEARCH_DOCUMENT = " || ' ' || ".join(SEARCH_FIELDS)
+# trigram דורש לפחות 3 תווים לכל מונח
+MIN_TERM_LENGTH = 3
+REBUILD_BATCH_SIZE = 5000
+# חיפוש קצר מדי ל-trigram נעשה לפי תחילית על העמודות שיש להן אינדקס b-tree
+PREFIX_FIELDS = ('customer_id', 'email', 'phone_number')
+# שגיאות SQLite שאומרות שאינדקס ה-FTS חסר או לא נתמך - רק בהן עוברים לחיפוש לפי תחילית
+MISSING_INDEX_ERRORS = ('no such table', 'no such module', 'no such tokenizer')
+
+logger = logging.getLogger(__name__)
+
+
+def sqlite_supports_trigram(connection):
+    """The FTS5 trigram tokenizer needs SQLite 3.34+."""
+    return connection.Database.sqlite_version_info >= (3, 34, 0)
+
+
+def create_search_index(connection):
+    """Create the backend-specific full-text index for customers."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            tokenizer = 'trigram' if sqlite_supports_trigram(connection) else 'unicode61'
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+                f"USING fts5({', '.join(SEARCH_FIELDS)}, tokenize='{tokenizer}')"
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} "
+                f"ON users_customer USING GIN (({SEARCH_DOCUMENT}) gin_trgm_ops)"
+            )
+
+
+def drop_search_index(connection):
+    """Drop the backend-specific full-text index."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f"DROP INDEX IF EXISTS {TRIGRAM_INDEX}")
+
+
+def index_customer(customer, using='default'):
+    """Insert or refresh one customer in the index (SQLite only; PostgreSQL is automatic)."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    values = [getattr(customer, field) or '' for field in SEARCH_FIELDS]
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [customer.pk])
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, {', '.join(SEARCH_FIELDS)}) "
+            f"VALUES (%s, {', '.join(['%s'] * len(SEARCH_FIELDS))})",
+            [customer.pk, *values],
+        )
+
+
+def unindex_customer(pk, using='default'):
+    """Remove one customer from the index (SQLite only)."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [pk])
+
+
+def rebuild_search_index(using='default', batch_size=REBUILD_BATCH_SIZE):
+    """Rebuild the whole index from users_customer. Returns the number of rows indexed."""
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        create_search_index(connection)
+        with connection.cursor() as cursor:
+            cursor.execute(f"REINDEX INDEX {TRIGRAM_INDEX}")
+        return Customer.objects.using(using).count()
+    if connection.vendor != 'sqlite':
+        return 0
+
+    indexed = 0
+    last_pk = 0
+    create_search_index(connection)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        while True:
+            # מעבר לפי מפתח ראשי במקטעים כדי לא לטעון את כל הטבלה לזיכרון
+            rows = list(
+                Customer.objects.using(using)
+                .filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', *SEARCH_FIELDS)[:batch_size]
+            )
+            if not rows:
+                break
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, {', '.join(SEARCH_FIELDS)}) "
+                f"VALUES (%s, {', '.join(['%s'] * len(SEARCH_FIELDS))})",
+                rows,
+            )
+            indexed += len(rows)
+            last_pk = rows[-1][0]
+    return indexed
+
+
+def _terms(query):
+    return [term for term in query.split() if term]
+
+
+def _prefix_search(queryset, terms, vendor, limit):
+    """Every term must be a prefix of customer_id, email or phone_number (b-tree index ranges)."""
+    for term in terms:
+        condition = Q()
+        for field in PREFIX_FIELDS:
+            condition |= prefix_q(field, term, vendor)
+        queryset = queryset.filter(condition)
+    return list(queryset.order_by('pk')[:limit])
+
+
+def _fts_match(terms, trigram):
+    """FTS5 query: every term as a substring (trigram) or as a word prefix (unicode61)."""
+    phrases = ['"{}"'.format(term.replace('"', '""')) for term in terms]
+    if not trigram:
+        phrases = [f'{phrase}*' for phrase in phrases]
+    return ' AND '.join(phrases)
+
+
+def _like_pattern(term):
+    return '%{}%'.format(term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+
+
+def _is_missing_index_error(error):
+    message = str(error).lower()
+    return any(marker in message for marker in MISSING_INDEX_ERRORS)
+
+
+def search_customers(query, limit=20, using=None):
+    """Return up to `limit` customers matching every term of `query`, best match first."""
+    terms = _terms(query)
+    if not terms:
+        return []
+    queryset = Customer.objects.all()
+    if using:
+        queryset = queryset.using(using)
+    connection = connections[queryset.db]
+    long_enough = all(len(term) >= MIN_TERM_LENGTH for term in terms)
+
+    if connection.vendor == 'sqlite':
+        trigram = sqlite_supports_trigram(connection)
+        if trigram and not long_enough:
+            return _prefix_search(queryset, terms, connection.vendor, limit)
+        sql = f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s ORDER BY rank LIMIT %s"
+        params = [_fts_match(terms, trigram), limit]
+    elif connection.vendor == 'postgresql' and long_enough:
+        conditions = ' AND '.join(f"({SEARCH_DOCUMENT}) ILIKE %s" for _ in terms)
+        sql = (
+            f"SELECT id FROM users_customer WHERE {conditions} "
+            f"ORDER BY similarity(({SEARCH_DOCUMENT}), %s) DESC, id LIMIT %s"
+        )
+        params = [*(_like_pattern(term) for term in terms), ' '.join(terms), limit]
+    else:
+        return _prefix_search(queryset, terms, connection.vendor, limit)
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            ids = [row[0] for row in cursor.fetchall()]
+    except OperationalError as error:
+        # רק SQLite בלי FTS5/טבלת אינדקס; שגיאות אחרות (database is locked) עולות ל-read_from_replica
+        if connection.vendor != 'sqlite' or not _is_missing_index_error(error):
+            raise
+        logger.warning("Customer search index unusable on %r (%s); using prefix search", connection.alias, error)
+        return _prefix_search(queryset, terms, connection.vendor, limit)
+    customers = queryset.in_bulk(ids)
+    return [customers[pk] for pk in ids if pk in customers]
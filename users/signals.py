@@ -0,0 +1,105 @@
+# users/signals.py
+from django.contrib.auth.signals import user_logged_in, user_login_failed
+from django.db.models.signals import post_save, post_delete, post_init
+from django.dispatch import receiver
+from . import audit, stats
+from .models import Customer, CustomerChange, User
+from .search import index_customer, unindex_customer
+
+
+CHANGE_FEED_FIELDS = ('customer_id', 'firstname', 'lastname', 'email', 'phone_number')
+
+
+@receiver(post_save, sender=Customer)
+def update_customer_search_index(sender, instance, using, **kwargs):
+    """Keep the full-text index in sync with the saved customer."""
+    index_customer(instance, using=using)
+
+
+@receiver(post_delete, sender=Customer)
+def remove_customer_search_index(sender, instance, using, **kwargs):
+    """Drop the deleted customer from the full-text index."""
+    unindex_customer(instance.pk, using=using)
+
+
+@receiver(post_save, sender=Customer)
+def log_customer_save(sender, instance, created, using, raw=False, **kwargs):
+    """Append a create/update entry to the customer change feed."""
+    if raw:
+        return
+    CustomerChange.objects.using(using).create(
+        customer_pk=instance.pk,
+        operation=CustomerChange.CREATE if created else CustomerChange.UPDATE,
+        data={field: getattr(instance, field) for field in CHANGE_FEED_FIELDS},
+    )
+
+
+@receiver(post_delete, sender=Customer)
+def log_customer_delete(sender, instance, using, **kwargs):
+    """Append a delete entry to the customer change feed."""
+    CustomerChange.objects.using(using).create(
+        customer_pk=instance.pk,
+        operation=CustomerChange.DELETE,
+        data={'customer_id': instance.customer_id},
+    )
+
+
+@receiver(post_save, sender=Customer)
+def audit_customer_create(sender, instance, created, raw=False, **kwargs):
+    """Queue a customer creation audit event, whichever code path created the customer."""
+    if not created or raw:
+        return
+    username, ip = audit.current_actor()
+    audit.record(audit.CUSTOMER_CREATE, username=username, ip=ip, customer_id=instance.customer_id)
+
+
+@receiver(user_logged_in)
+def audit_login_success(sender, request, user, **kwargs):
+    """Queue a login success audit event."""
+    audit.record(audit.LOGIN_SUCCESS, username=user.get_username(), ip=audit.client_ip(request))
+
+
+@receiver(user_login_failed)
+def audit_login_failure(sender, credentials, request=None, **kwargs):
+    """Queue a login failure audit event (credentials arrive already sanitised)."""
+    audit.record(audit.LOGIN_FAILURE, username=credentials.get('username', ''), ip=audit.client_ip(request))
+
+
+@receiver(post_save, sender=Customer)
+def count_customer_save(sender, instance, created, raw=False, **kwargs):
+    """Bump the customer totals when a customer is created."""
+    if created and not raw:
+        stats.increment(stats.CUSTOMERS_TOTAL)
+        stats.increment(stats.new_customers_key())
+
+
+@receiver(post_delete, sender=Customer)
+def count_customer_delete(sender, instance, **kwargs):
+    """Lower the customer total when a customer is deleted."""
+    stats.increment(stats.CUSTOMERS_TOTAL, -1)
+
+
+@receiver(post_init, sender=User)
+def remember_user_active(sender, instance, **kwargs):
+    """Remember the loaded is_active value so saves can adjust the active-user counter."""
+    # __dict__ כדי לא לטעון שדה דחוי (deferred)
+    instance._loaded_is_active = instance.__dict__.get('is_active')
+
+
+@receiver(post_save, sender=User)
+def count_user_save(sender, instance, created, raw=False, **kwargs):
+    """Adjust the active-user counter on create or (de)activation."""
+    if raw:
+        return
+    previous = False if created else instance._loaded_is_active
+    if previous is not None and previous != instance.is_active:
+        stats.increment(stats.ACTIVE_USERS, 1 if instance.is_active else -1)
+    instance._loaded_is_active = instance.is_active
+
+
+@receiver(post_delete, sender=User)
+def count_user_delete(sender, instance, **kwargs):
+    """Lower the active-user counter when an active user is deleted."""
+    if instance.is_active:
+        stats.increment(stats.ACTIVE_USERS, -1)
+
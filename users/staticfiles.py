@@ -0,0 +1,111 @@
+# users/staticfiles.py
+import gzip
+import mimetypes
+import os
+import re
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # brotli אופציונלי - בלעדיו נוצרים רק קבצי gz
+    brotli = None
+
+# ManifestStaticFilesStorage מוסיף לשם הקובץ hash של 12 תווים - קבצים כאלה לא משתנים לעולם
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_COMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.html', '.txt', '.json', '.xml', '.map', '.ico')
+# סדר העדפה: brotli קטן יותר מ-gzip
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def compress_file(path):
+    """Write path.gz (and path.br when brotli is installed) next to `path` if it pays off."""
+    with open(path, 'rb') as f:
+        content = f.read()
+    if len(content) < getattr(settings, 'STATIC_COMPRESS_MIN_SIZE', 256):
+        return []
+    written = []
+    variants = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', lambda data: brotli.compress(data, quality=11)))
+    for suffix, compress in variants:
+        compressed = compress(content)
+        # לא שומרים גרסה דחוסה שלא חוסכת לפחות 5%
+        if len(compressed) < len(content) * 0.95:
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            written.append(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest-hashed static files, precompressed to .gz/.br at collectstatic time."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        extensions = tuple(getattr(settings, 'STATIC_COMPRESS_EXTENSIONS', DEFAULT_COMPRESS_EXTENSIONS))
+        for name in list(self.hashed_files.values()) + list(paths):
+            if name.endswith(extensions) and self.exists(name):
+                compress_file(self.path(name))
+
+
+def accepted_encodings(header):
+    """Encodings the client accepts (q=0 excluded)."""
+    accepted = set()
+    for part in header.split(','):
+        token, _, params = part.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        if token:
+            accepted.add(token.strip().lower())
+    return accepted
+
+
+def _lookup_static_file(name, encoding):
+    root = os.path.realpath(str(settings.STATIC_ROOT))
+    path = os.path.realpath(os.path.join(root, name))
+    if not path.startswith(root + os.sep):
+        return None
+    suffix = dict(ENCODINGS).get(encoding, '')
+    if suffix:
+        path += suffix
+    return path if os.path.isfile(path) else None
+
+
+# שם עם hash מצביע תמיד על אותו תוכן, ולכן שומרים את המיקום שנמצא (רק הצלחות - קובץ
+# שעוד לא נאסף יופיע אחרי collectstatic). שמות בלי hash נבדקים מול הדיסק בכל בקשה.
+HASHED_PATH_CACHE_SIZE = 4096
+_hashed_paths = {}
+
+
+def find_static_file(name, encoding):
+    """Return the path of `name` (or its `encoding` variant) under STATIC_ROOT, or None."""
+    key = (name, encoding)
+    path = _hashed_paths.get(key)
+    if path is None:
+        path = _lookup_static_file(name, encoding)
+        if path is not None and HASHED_NAME_RE.search(name) and len(_hashed_paths) < HASHED_PATH_CACHE_SIZE:
+            _hashed_paths[key] = path
+    return path
+
+
+def forget_static_file(name):
+    """Drop cached locations of `name` (e.g. the file vanished in a later collectstatic)."""
+    for encoding in ('', *dict(ENCODINGS)):
+        _hashed_paths.pop((name, encoding), None)
+
+
+def content_type(name):
+    mime, _ = mimetypes.guess_type(name)
+    if mime and (mime.startswith('text/') or mime in ('application/javascript', 'image/svg+xml', 'application/json')):
+        return f'{mime}; charset=utf-8'
+    return mime or 'application/octet-stream'
+
+
+def cache_control(name):
+    if HASHED_NAME_RE.search(name):
+        return IMMUTABLE_CACHE_CONTROL
+    return f"public, max-age={getattr(settings, 'STATIC_UNHASHED_MAX_AGE', 300)}"
@@ -0,0 +1,199 @@
+# users/stats.py
+import atexit
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, time as dt_time, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Customer, CustomerChange, DashboardCounter, User
+
+# מונים מצטברים ללוח הבקרה: ה-signals צוברים דלתאות בזיכרון (אחרי commit בלבד) וכל
+# תהליך כותב אותן באצווה - UPDATE אחד לכל מונה לכל היותר פעם ב-DASHBOARD_COUNTER_FLUSH_INTERVAL,
+# כך שטרנזקציית יצירת הלקוח לא נועלת שורת מונה "חמה". ה-cache לא נמחק בעדכון - פג לפי TTL.
+# reconcile_dashboard_stats (מחזורי) מתאם מחדש מול COUNT(*) ומחשב את החשבונות הנעולים.
+CUSTOMERS_TOTAL = 'customers_total'
+ACTIVE_USERS = 'active_users'
+LOCKED_OUT = 'locked_out_accounts'
+# זמן ה-snapshot של ה-reconcile האחרון (מילישניות epoch) - דלתאות ישנות ממנו כבר בתוך ה-COUNT
+RECONCILED_AT = 'reconciled_at'
+CACHE_KEY = 'dashboard_stats'
+
+# שם מונה -> [(זמן commit במילישניות, דלתא)]
+_pending = defaultdict(list)
+_pending_lock = threading.Lock()
+_flush_state = {'at': time.monotonic()}
+_flusher = {'thread': None, 'pid': None}
+
+
+def new_customers_key(day=None):
+    """Counter name for customers created on `day` (local date, default today)."""
+    return f'customers_new:{(day or timezone.localdate()).isoformat()}'
+
+
+def increment(name, delta=1):
+    """Add `delta` to a counter once the current transaction commits; written in batches."""
+    transaction.on_commit(lambda: _add_pending(name, delta))
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def _flush_interval():
+    return getattr(settings, 'DASHBOARD_COUNTER_FLUSH_INTERVAL', 5)
+
+
+def _add_pending(name, delta):
+    with _pending_lock:
+        _pending[name].append((_now_ms(), delta))
+        due = time.monotonic() - _flush_state['at'] >= _flush_interval()
+    _ensure_flusher()
+    if due:
+        flush_pending()
+
+
+def _requeue(pending):
+    with _pending_lock:
+        for name, entries in pending.items():
+            _pending[name][:0] = entries
+
+
+def _reconciled_at():
+    return DashboardCounter.objects.filter(name=RECONCILED_AT).values_list('value', flat=True).first() or 0
+
+
+def flush_pending():
+    """Write this process's buffered deltas, one UPDATE per counter. Returns the counters written.
+
+    Deltas committed before the last reconcile snapshot are already part of
+    its exact counts (reconcile may run in another process) and are dropped.
+    """
+    with _pending_lock:
+        pending = {name: entries for name, entries in _pending.items() if entries}
+        _pending.clear()
+        _flush_state['at'] = time.monotonic()
+    if not pending:
+        return 0
+    try:
+        reconciled_at = _reconciled_at()
+    except DatabaseError:
+        _requeue(pending)
+        return 0
+    written = 0
+    for name, entries in pending.items():
+        entries = [(committed_at, delta) for committed_at, delta in entries if committed_at > reconciled_at]
+        delta = sum(delta for _committed_at, delta in entries)
+        if not delta:
+            continue
+        try:
+            _apply(name, delta)
+        except DatabaseError:
+            # נחזיר לתור וננסה בכתיבה הבאה; reconcile יתקן אם התהליך ימות לפני כן
+            _requeue({name: entries})
+        else:
+            written += 1
+    return written
+
+
+def _ensure_flusher():
+    """Start this process's timed flush thread (again after a fork) so idle workers don't hold deltas."""
+    if _flusher['pid'] == os.getpid() and _flusher['thread'].is_alive():
+        return
+    with _pending_lock:
+        if _flusher['pid'] == os.getpid() and _flusher['thread'].is_alive():
+            return
+        thread = threading.Thread(target=_run_flusher, name='dashboard-counter-flusher', daemon=True)
+        _flusher.update(thread=thread, pid=os.getpid())
+        thread.start()
+
+
+def _run_flusher():
+    while True:
+        time.sleep(_flush_interval())
+        with _pending_lock:
+            due = any(_pending.values())
+        if due:
+            flush_pending()
+            close_old_connections()
+
+
+def _apply(name, delta):
+    if not DashboardCounter.objects.filter(name=name).update(value=F('value') + delta):
+        counter, created = DashboardCounter.objects.get_or_create(name=name, defaults={'value': delta})
+        if not created:
+            DashboardCounter.objects.filter(name=name).update(value=F('value') + delta)
+
+
+def set_counter(name, value):
+    DashboardCounter.objects.update_or_create(name=name, defaults={'value': value})
+
+
+def dashboard_stats():
+    """Return the dashboard totals with a single indexed read (cached for a few seconds)."""
+    stats = cache.get(CACHE_KEY)
+    if stats is not None:
+        return stats
+    flush_pending()
+    names = [CUSTOMERS_TOTAL, new_customers_key(), ACTIVE_USERS, LOCKED_OUT]
+    values = dict(DashboardCounter.objects.filter(name__in=names).values_list('name', 'value'))
+    if CUSTOMERS_TOTAL not in values:
+        # המונים עוד לא אותחלו - חישוב מלא חד-פעמי
+        reconcile()
+        values = dict(DashboardCounter.objects.filter(name__in=names).values_list('name', 'value'))
+    stats = {
+        'customers_total': values.get(CUSTOMERS_TOTAL, 0),
+        'customers_new_today': values.get(new_customers_key(), 0),
+        'active_users': values.get(ACTIVE_USERS, 0),
+        'locked_out_accounts': values.get(LOCKED_OUT, 0),
+    }
+    cache.set(CACHE_KEY, stats, getattr(settings, 'DASHBOARD_STATS_TTL', 10))
+    return stats
+
+
+def _lockout_window():
+    cool_off = getattr(settings, 'AXES_COOLOFF_TIME', 1)
+    if isinstance(cool_off, timedelta):
+        return cool_off
+    return timedelta(hours=cool_off or 0)
+
+
+def count_locked_out():
+    """Accounts currently locked out by django-axes."""
+    from axes.models import AccessAttempt
+    from axes.helpers import get_failure_limit
+    return (
+        AccessAttempt.objects.filter(
+            failures_since_start__gte=get_failure_limit(None, None),
+            attempt_time__gte=timezone.now() - _lockout_window(),
+        )
+        .values('username')
+        .distinct()
+        .count()
+    )
+
+
+def reconcile():
+    """Recompute every counter with exact queries; meant for a periodic job."""
+    # ה-snapshot נלקח לפני הספירה: כל תהליך משמיט דלתאות שנכנסו ל-commit לפניו
+    snapshot = _now_ms()
+    today = timezone.localdate()
+    midnight = timezone.make_aware(datetime.combine(today, dt_time.min))
+    set_counter(CUSTOMERS_TOTAL, Customer.objects.count())
+    set_counter(
+        new_customers_key(today),
+        CustomerChange.objects.filter(operation=CustomerChange.CREATE, changed_at__gte=midnight).count(),
+    )
+    set_counter(ACTIVE_USERS, User.objects.filter(is_active=True).count())
+    set_counter(LOCKED_OUT, count_locked_out())
+    set_counter(RECONCILED_AT, snapshot)
+    # מונים יומיים ישנים לא נחוצים
+    DashboardCounter.objects.filter(name__startswith='customers_new:').exclude(name=new_customers_key(today)).delete()
+    cache.delete(CACHE_KEY)
+
+
+atexit.register(flush_pending)
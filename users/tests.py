@@ -1,3 +1,1041 @@
-from django.test import TestCase
+import io
+import json
+import re
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from axes.helpers import get_failure_limit
+from axes.models import AccessAttempt
+from axes.signals import user_locked_out
+from django.contrib import messages
+from django.contrib.admin.sites import AdminSite
+from django.contrib.auth import authenticate
+from django.contrib.messages.storage import default_storage
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import OperationalError, connections
+from django.http import HttpResponse
+from django.conf import settings
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from Communication_LTD import password_config
+
+from . import admin as users_admin
+from . import audit, backfill, changefeed, dedupe, pagecache, profiling, routers, search, staticfiles, stats, validators
+from .normalize import canonical_email, fold_name, normalize_phone
+from .models import AuditLogEntry, BackfillCheckpoint, Customer, CustomerChange, DashboardCounter, User
+
+STRONG_PASSWORD = 'Str0ng!Passw0rd'
+
+
+def make_customer(n, **fields):
+    values = {
+        'firstname': f'First{n}',
+        'lastname': f'Last{n}',
+        'customer_id': f'C{n:05d}',
+        'email': f'customer{n}@example.com',
+        'phone_number': f'050{n:07d}',
+    }
+    values.update(fields)
+    return Customer.objects.create(**values)
+
+
+# --- admin -------------------------------------------------------------------
+
+class AdminSearchTests(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/admin/users/user/')
+        self.user_admin = users_admin.UserAdmin(User, AdminSite())
+        for name in ('alice', 'alina', 'bob'):
+            User.objects.create_user(name, f'{name}@example.com')
+
+    def search(self, term):
+        queryset, may_have_duplicates = self.user_admin.get_search_results(
+            self.request, User.objects.all(), term)
+        self.assertFalse(may_have_duplicates)
+        return queryset
+
+    def test_prefix_match_on_any_search_field(self):
+        self.assertEqual(sorted(self.search('ali').values_list('username', flat=True)), ['alice', 'alina'])
+        self.assertEqual(list(self.search('bob@').values_list('username', flat=True)), ['bob'])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(list(self.search('ali alin').values_list('username', flat=True)), ['alina'])
+        self.assertFalse(self.search('ali bob').exists())
+
+    def test_does_not_match_inside_the_value(self):
+        self.assertFalse(self.search('lice').exists())
+
+    def test_search_uses_the_indexes(self):
+        plan = self.search('ali').explain()
+        self.assertIn('USING INDEX', plan)
+        self.assertNotIn('SCAN', plan)
+
+    def test_customer_search_uses_the_indexes(self):
+        customer_admin = users_admin.CustomerAdmin(Customer, AdminSite())
+        queryset, _ = customer_admin.get_search_results(self.request, Customer.objects.all(), '050')
+        self.assertNotIn('SCAN', queryset.explain())
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def setUp(self):
+        for n in range(3):
+            make_customer(n)
+
+    def test_unfiltered_large_table_uses_the_estimate(self):
+        paginator = users_admin.EstimatedCountPaginator(Customer.objects.order_by('pk'), 50)
+        with mock.patch.object(users_admin, 'estimated_row_count', return_value=123456):
+            self.assertEqual(paginator.count, 123456)
+
+    def test_small_estimate_falls_back_to_count(self):
+        paginator = users_admin.EstimatedCountPaginator(Customer.objects.order_by('pk'), 50)
+        with mock.patch.object(users_admin, 'estimated_row_count', return_value=5):
+            self.assertEqual(paginator.count, 3)
+
+    def test_filtered_queryset_is_counted(self):
+        queryset = Customer.objects.filter(customer_id='C00001').order_by('pk')
+        paginator = users_admin.EstimatedCountPaginator(queryset, 50)
+        with mock.patch.object(users_admin, 'estimated_row_count', return_value=123456) as estimate:
+            self.assertEqual(paginator.count, 1)
+        estimate.assert_not_called()
+
+    def test_sqlite_estimate_is_max_pk(self):
+        self.assertEqual(users_admin.estimated_row_count(Customer), Customer.objects.order_by('-pk')[0].pk)
+
+
+class UserAdminActionTests(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().post('/admin/users/user/')
+        self.user_admin = users_admin.UserAdmin(User, AdminSite())
+        self.active = [User.objects.create_user(f'user{n}', f'user{n}@example.com', STRONG_PASSWORD) for n in range(2)]
+        self.inactive = User.objects.create_user('gone', 'gone@example.com', is_active=False)
+
+    def test_deactivate_users(self):
+        with mock.patch.object(self.user_admin, 'message_user'), \
+                mock.patch.object(users_admin.stats, 'increment') as increment:
+            self.user_admin.deactivate_users(self.request, User.objects.all())
+        self.assertFalse(User.objects.filter(is_active=True).exists())
+        # רק המשתמשים שהיו פעילים נספרים
+        increment.assert_called_once_with(stats.ACTIVE_USERS, -2)
+
+    def test_force_password_reset(self):
+        User.objects.filter(pk=self.active[0].pk).update(reset_token='token')
+        with mock.patch.object(self.user_admin, 'message_user'):
+            self.user_admin.force_password_reset(self.request, User.objects.filter(pk__in=[u.pk for u in self.active]))
+        for user in User.objects.filter(pk__in=[u.pk for u in self.active]):
+            self.assertFalse(user.has_usable_password())
+            self.assertFalse(user.check_password(STRONG_PASSWORD))
+            self.assertIsNone(user.reset_token)
+
+
+# --- replicas / login --------------------------------------------------------
+
+# רפליקה שנייה (מסד SQLite נפרד) מוגדרת ב-test_settings; נוצרת רק עבור מחלקות שמבקשות אותה
+REPLICA = settings.TEST_REPLICA
+
+
+def drop_user_table(alias):
+    with connections[alias].cursor() as cursor:
+        cursor.execute(f'DROP TABLE "{User._meta.db_table}"')
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingTests(TestCase):
+    databases = {'default', REPLICA}
+
+    def setUp(self):
+        routers._replica_health.clear()
+        self.addCleanup(routers._replica_health.clear)
+        # כל טסט מתחיל כמו בקשה חדשה - לא "נעוץ" ל-primary בגלל כתיבות קודמות
+        scope = routers.request_routing_scope()
+        scope.__enter__()
+        self.addCleanup(scope.__exit__, None, None, None)
+
+    def test_reads_use_replica_only_when_asked(self):
+        # bulk_create - בלי signals שכותבים ל-primary ו"נועצים" את הבקשה אליו
+        User.objects.using(REPLICA).bulk_create([User(username='on_replica', email='r@example.com')])
+        self.assertTrue(routers.read_from_replica(User.objects.filter(username='on_replica').exists))
+        self.assertFalse(User.objects.filter(username='on_replica').exists())
+
+    def test_unmigrated_replica_is_not_healthy(self):
+        drop_user_table(REPLICA)
+        self.assertFalse(routers.is_replica_healthy(REPLICA))
+        self.assertEqual(routers.pick_replica(), routers.PRIMARY_DB)
+
+    def test_write_pins_rest_of_request_to_primary(self):
+        router = routers.PrimaryReplicaRouter()
+        with routers.request_routing_scope():
+            with routers.replica_reads():
+                self.assertEqual(router.db_for_read(User), REPLICA)
+                self.assertEqual(router.db_for_write(User), routers.PRIMARY_DB)
+                self.assertEqual(router.db_for_read(User), routers.PRIMARY_DB)
+        with routers.request_routing_scope(), routers.replica_reads():
+            self.assertEqual(router.db_for_read(User), REPLICA)
+
+    def test_failing_replica_is_marked_unhealthy_and_read_retried_on_primary(self):
+        User.objects.create_user('primary_user', 'p@example.com')
+        self.assertTrue(routers.is_replica_healthy(REPLICA))
+        # הרפליקה "נשברת" אחרי בדיקת התקינות (שנשמרת ב-cache)
+        drop_user_table(REPLICA)
+        with routers.request_routing_scope():
+            usernames = routers.read_from_replica(lambda: list(User.objects.values_list('username', flat=True)))
+        self.assertEqual(usernames, ['primary_user'])
+        self.assertFalse(routers.is_replica_healthy(REPLICA))
+
+    def test_backend_falls_back_to_primary_for_rows_not_yet_replicated(self):
+        User.objects.create_user('newcomer', 'n@example.com', STRONG_PASSWORD)
+        with routers.request_routing_scope(), self.assertNumQueries(2, using=REPLICA):  # בדיקת תקינות + חיפוש
+            user = authenticate(None, username='newcomer', password=STRONG_PASSWORD)
+        self.assertEqual(user.username, 'newcomer')
+
+
+    def test_stale_replica_password_is_rechecked_on_primary(self):
+        user = User.objects.create_user('mover', 'm@example.com', 'Old!Passw0rd1')
+        User.objects.using(REPLICA).bulk_create([User(username='mover', email='m@example.com', password=user.password)])
+        user.set_password(STRONG_PASSWORD)
+        user.save()
+        with routers.request_routing_scope():
+            self.assertEqual(authenticate(None, username='mover', password=STRONG_PASSWORD).pk, user.pk)
+        with routers.request_routing_scope():
+            self.assertIsNone(authenticate(None, username='mover', password='Old!Passw0rd1'))
+            self.assertIsNone(authenticate(None, username='mover', password='Wr0ng!Password'))
+
+    @override_settings(CHANGE_FEED_SAFETY_LAG=0)
+    def test_change_feed_reads_the_primary_even_under_replica_reads(self):
+        make_customer(1)
+        with routers.request_routing_scope(), routers.replica_reads():
+            changes, _cursor, _has_more = changefeed.changes_after(0)
+        self.assertEqual([change['operation'] for change in changes], ['create'])
+
+@override_settings(ROOT_URLCONF='users.urls')
+class LoginTests(TestCase):
+    def setUp(self):
+        User.objects.create_user('dana', 'dana@example.com', STRONG_PASSWORD)
+
+    def post_login(self, username, password):
+        with mock.patch.object(audit, 'record') as record:
+            response = self.client.post('/login/', {'username': username, 'password': password})
+        return response, [call.args[0] for call in record.call_args_list]
+
+    def test_wrong_password_counts_one_failure(self):
+        response, events = self.post_login('dana', 'Wr0ng!Password')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AccessAttempt.objects.get(username='dana').failures_since_start, 1)
+        self.assertEqual(events, [audit.LOGIN_FAILURE])
+
+    def test_unknown_username_counts_one_failure(self):
+        response, events = self.post_login('nobody', 'Wr0ng!Password')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AccessAttempt.objects.get(username='nobody').failures_since_start, 1)
+        self.assertEqual(events, [audit.LOGIN_FAILURE])
+
+    def test_correct_password_logs_in(self):
+        response, events = self.post_login('dana', STRONG_PASSWORD)
+        self.assertRedirects(response, '/home/', fetch_redirect_response=False)
+        self.assertEqual(events, [audit.LOGIN_SUCCESS])
+
+
+# --- customer search ---------------------------------------------------------
+
+class CustomerSearchTests(TestCase):
+    def setUp(self):
+        self.dana = make_customer(1, firstname='Dana', lastname='Levi', email='dana.levi@example.com',
+                                  phone_number='0521234567')
+        self.yossi = make_customer(2, firstname='Yossi', lastname='Cohen', email='yossi@example.org',
+                                   phone_number='0549876543')
+
+    def ids(self, query):
+        return [customer.customer_id for customer in search.search_customers(query)]
+
+    def test_matches_fragments_inside_fields(self):
+        self.assertEqual(self.ids('1234'), [self.dana.customer_id])
+        self.assertEqual(self.ids('levi@exa'), [self.dana.customer_id])
+        self.assertEqual(self.ids('ohe'), [self.yossi.customer_id])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.ids('dana 052'), [self.dana.customer_id])
+        self.assertEqual(self.ids('dana 054'), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.dana.lastname = 'Mizrahi'
+        self.dana.save()
+        self.assertEqual(self.ids('levi@'), [self.dana.customer_id])
+        self.assertEqual(self.ids('mizra'), [self.dana.customer_id])
+        self.dana.delete()
+        self.assertEqual(self.ids('mizra'), [])
+
+    def test_short_terms_use_indexed_prefix_search(self):
+        self.assertEqual(self.ids('05'), [self.dana.customer_id, self.yossi.customer_id])
+        self.assertEqual(self.ids('yo'), [self.yossi.customer_id])
+        # אמצע מחרוזת קצר מדי ל-trigram לא נמצא
+        self.assertEqual(self.ids('ev'), [])
+
+    def test_falls_back_when_the_fts_table_is_unusable(self):
+        search.drop_search_index(connections['default'])
+        with self.assertLogs('users.search', 'WARNING'):
+            self.assertEqual(self.ids('dana.levi'), [self.dana.customer_id])
+
+    def test_other_operational_errors_propagate(self):
+        locked = OperationalError('database is locked')
+        with mock.patch('django.db.backends.utils.CursorWrapper.execute', side_effect=locked), \
+                self.assertRaisesMessage(OperationalError, 'database is locked'):
+            search.search_customers('dana.levi')
+
+    def test_rebuild_recreates_the_index(self):
+        search.drop_search_index(connections['default'])
+        self.assertEqual(search.rebuild_search_index(), 2)
+        self.assertEqual(self.ids('9876'), [self.yossi.customer_id])
+
+    def test_word_prefix_match_without_trigram(self):
+        self.assertEqual(search._fts_match(['da', 'le"vi'], trigram=True), '"da" AND "le""vi"')
+        self.assertEqual(search._fts_match(['da', 'levi'], trigram=False), '"da"* AND "levi"*')
+
+
+# --- request profiler --------------------------------------------------------
+
+class ProfilerTests(TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        directory_setting = override_settings(REQUEST_PROFILER_DIR=self.directory, REQUEST_PROFILER_MAX_CAPTURES=2)
+        directory_setting.enable()
+        self.addCleanup(directory_setting.disable)
+        profiling._arm_state.update(checked_at=0.0, config=None)
+        self.addCleanup(profiling._arm_state.update, checked_at=0.0, config=None)
+
+    def write_arm_file(self, text):
+        (self.directory / profiling.ARM_FILE_NAME).write_text(text, encoding='utf-8')
+        profiling._arm_state['checked_at'] = 0.0
+
+    def test_arm_and_disarm(self):
+        profiling.arm(['/register/'], sample_rate=0.5, duration=60)
+        self.assertEqual(profiling.current_arming()['paths'], ['/register/'])
+        profiling.disarm()
+        self.assertIsNone(profiling.current_arming())
+
+    def test_arming_expires(self):
+        profiling.arm(['/register/'], duration=-1)
+        self.assertIsNone(profiling.current_arming())
+
+    def test_malformed_arm_file_is_disarmed(self):
+        for text in ('not json', '[]', '{"paths": ["/"], "sample_rate": 1}',
+                     '{"sample_rate": 1, "until": 9999999999}',
+                     '{"paths": "/", "sample_rate": 1, "until": 9999999999}'):
+            self.write_arm_file(text)
+            self.assertIsNone(profiling.current_arming(), text)
+            self.assertFalse(profiling.should_profile('/'))
+
+    def test_sampling(self):
+        profiling.arm(['/register/'], sample_rate=0.5, duration=60)
+        with mock.patch.object(profiling.random, 'random', return_value=0.4):
+            self.assertTrue(profiling.should_profile('/register/'))
+            self.assertFalse(profiling.should_profile('/login/'))
+        with mock.patch.object(profiling.random, 'random', return_value=0.6):
+            self.assertFalse(profiling.should_profile('/register/'))
+
+    def test_capture_is_stored_in_pairs(self):
+        self.assertEqual(profiling.profile_call('/register/', lambda: 'done'), 'done')
+        captures = profiling.list_captures()
+        self.assertEqual(sorted(name.rsplit('.', 1)[1] for name in captures), ['prof', 'tracemalloc'])
+
+    def test_ring_buffer_keeps_newest_captures(self):
+        for stem in ('20260101-000001', '20260101-000002', '20260101-000003'):
+            for suffix in ('.prof', '.tracemalloc'):
+                (self.directory / f'{stem}{suffix}').write_bytes(b'')
+        profiling._trim_captures(self.directory)
+        self.assertEqual(
+            profiling.list_captures(),
+            ['20260101-000003.tracemalloc', '20260101-000003.prof',
+             '20260101-000002.tracemalloc', '20260101-000002.prof'],
+        )
+
+    def test_capture_path_only_resolves_capture_files(self):
+        (self.directory / 'ok.prof').write_bytes(b'')
+        profiling.arm(['/'])
+        self.assertEqual(profiling.capture_path('ok.prof'), self.directory / 'ok.prof')
+        self.assertIsNone(profiling.capture_path('missing.prof'))
+        self.assertIsNone(profiling.capture_path(profiling.ARM_FILE_NAME))
+        self.assertIsNone(profiling.capture_path('../ok.prof'))
+
+    @override_settings(ROOT_URLCONF='users.urls')
+    def test_download_view(self):
+        (self.directory / 'ok.prof').write_bytes(b'stats')
+        profiling.arm(['/nothing/'])
+        self.client.force_login(User.objects.create_user('admin', 'admin@example.com', is_admin=True))
+        response = self.client.get('/profiler/captures/ok.prof/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'stats')
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.assertEqual(self.client.get(f'/profiler/captures/{profiling.ARM_FILE_NAME}/').status_code, 404)
+        self.assertEqual(self.client.get('/profiler/captures/missing.prof/').status_code, 404)
+
+
+# --- audit pipeline ----------------------------------------------------------
+
+class AuditPipelineTests(TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.log_file = self.directory / 'audit.jsonl'
+        log_settings = override_settings(AUDIT_LOG_BACKEND='file', AUDIT_LOG_FILE=self.log_file)
+        log_settings.enable()
+        self.addCleanup(log_settings.disable)
+        self.pipeline = audit.AuditPipeline()
+        # בלי thread ברקע - הטסטים קוראים ל-flush בעצמם
+        writer = mock.patch.object(self.pipeline, '_ensure_writer')
+        writer.start()
+        self.addCleanup(writer.stop)
+
+    def logged_usernames(self):
+        usernames = []
+        for path in sorted(self.directory.glob('audit.jsonl*')):
+            if not path.name.endswith('.lock'):
+                usernames += [json.loads(line)['username'] for line in path.read_text().splitlines()]
+        return usernames
+
+    @override_settings(AUDIT_BUFFER_SIZE=3, AUDIT_DROP_POLICY='drop_oldest')
+    def test_drop_oldest(self):
+        for n in range(5):
+            self.pipeline.record(audit.LOGIN_FAILURE, username=f'u{n}')
+        self.assertEqual(self.pipeline.stats(), {'enqueued': 5, 'flushed': 0, 'dropped': 2, 'failed_flushes': 0, 'pending': 3})
+        self.pipeline.flush()
+        self.assertEqual(self.logged_usernames(), ['u2', 'u3', 'u4'])
+
+    @override_settings(AUDIT_BUFFER_SIZE=3, AUDIT_DROP_POLICY='drop_newest')
+    def test_drop_newest(self):
+        for n in range(5):
+            self.pipeline.record(audit.LOGIN_FAILURE, username=f'u{n}')
+        self.assertEqual(self.pipeline.stats()['enqueued'], 3)
+        self.assertEqual(self.pipeline.stats()['dropped'], 2)
+        self.assertEqual(self.pipeline.flush(), 3)
+        self.assertEqual(self.logged_usernames(), ['u0', 'u1', 'u2'])
+
+    def test_flush_counters(self):
+        self.pipeline.record(audit.LOGIN_SUCCESS, username='dana', ip='10.0.0.1', source='test')
+        self.assertEqual(self.pipeline.flush(), 1)
+        self.assertEqual(self.pipeline.flush(), 0)
+        self.assertEqual(self.pipeline.stats(), {'enqueued': 1, 'flushed': 1, 'dropped': 0, 'failed_flushes': 0, 'pending': 0})
+        entry = json.loads(self.log_file.read_text())
+        self.assertEqual((entry['event'], entry['ip'], entry['details']), (audit.LOGIN_SUCCESS, '10.0.0.1', {'source': 'test'}))
+
+    def test_failed_flush_counts_the_batch_as_dropped(self):
+        self.log_file.mkdir()
+        self.pipeline.record(audit.LOGIN_FAILURE, username='dana')
+        self.assertEqual(self.pipeline.flush(), 0)
+        self.assertEqual(self.pipeline.stats()['failed_flushes'], 1)
+        self.assertEqual(self.pipeline.stats()['dropped'], 1)
+
+    @override_settings(AUDIT_LOG_BACKEND='database')
+    def test_database_backend(self):
+        self.pipeline.record(audit.PASSWORD_CHANGE, username='dana')
+        self.pipeline.flush()
+        self.assertEqual(AuditLogEntry.objects.get().event, audit.PASSWORD_CHANGE)
+
+    @override_settings(AUDIT_LOG_MAX_BYTES=500, AUDIT_LOG_BACKUP_COUNT=3)
+    def test_rotation_keeps_backup_count(self):
+        for n in range(40):
+            audit._write_file([{'ts': 0, 'event': 'x', 'username': f'u{n:02d}', 'ip': None, 'details': {}}])
+        backups = sorted(path.name for path in self.directory.glob('audit.jsonl.[0-9]*'))
+        self.assertEqual(backups, ['audit.jsonl.1', 'audit.jsonl.2', 'audit.jsonl.3'])
+        self.assertLessEqual(self.log_file.stat().st_size, 500)
+        # הקבצים שנשארו מכילים את האירועים האחרונים, ברצף
+        kept = self.logged_usernames()
+        self.assertEqual(sorted(kept), [f'u{n:02d}' for n in range(40 - len(kept), 40)])
+
+    @override_settings(AUDIT_LOG_MAX_BYTES=1000, AUDIT_LOG_BACKUP_COUNT=100)
+    def test_concurrent_writers_lose_nothing_across_rotations(self):
+        def write(worker):
+            for n in range(50):
+                audit._write_file([{'ts': 0, 'event': 'x', 'username': f'w{worker}-{n}', 'ip': None, 'details': {}}])
+
+        threads = [threading.Thread(target=write, args=(worker,)) for worker in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.logged_usernames()), 400)
+        self.assertEqual(len(set(self.logged_usernames())), 400)
+
+
+
+class CustomerCreateAuditTests(TestCase):
+    def created_events(self, record):
+        return [call for call in record.call_args_list if call.args[0] == audit.CUSTOMER_CREATE]
+
+    def test_admin_created_customer_is_audited_with_the_admin_user(self):
+        admin_user = User.objects.create_user('boss', 'boss@example.com', STRONG_PASSWORD, is_admin=True, is_superuser=True)
+        self.client.force_login(admin_user)
+        with mock.patch.object(audit, 'record') as record:
+            response = self.client.post('/admin/users/customer/add/', {
+                'firstname': 'Dana', 'lastname': 'Levi', 'customer_id': 'C00001',
+                'email': 'dana@example.com', 'phone_number': '0521234567',
+            }, REMOTE_ADDR='10.0.0.7')
+        self.assertEqual(response.status_code, 302)
+        [event] = self.created_events(record)
+        self.assertEqual(event.kwargs, {'username': 'boss', 'ip': '10.0.0.7', 'customer_id': 'C00001'})
+
+    def test_customer_created_outside_a_request_is_audited_without_actor(self):
+        with mock.patch.object(audit, 'record') as record:
+            make_customer(1)
+        [event] = self.created_events(record)
+        self.assertEqual(event.kwargs, {'username': '', 'ip': None, 'customer_id': 'C00001'})
+
+    def test_suite_does_not_write_to_the_real_log(self):
+        self.assertNotEqual(Path(settings.AUDIT_LOG_FILE).parent, Path(settings.BASE_DIR) / 'logs')
+
+# --- customer change feed ----------------------------------------------------
+
+@override_settings(CHANGE_FEED_SAFETY_LAG=0)
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.customers = [make_customer(n) for n in range(5)]
+        self.customers[0].firstname = 'Renamed'
+        self.customers[0].save()
+
+    def test_cursor_paging(self):
+        changes, cursor, has_more = changefeed.changes_after(0, limit=4)
+        self.assertEqual([change['operation'] for change in changes], ['create'] * 4)
+        self.assertTrue(has_more)
+        changes, cursor, has_more = changefeed.changes_after(cursor, limit=4)
+        self.assertEqual([change['operation'] for change in changes], ['create', 'update'])
+        self.assertEqual(changes[-1]['data']['firstname'], 'Renamed')
+        self.assertFalse(has_more)
+        self.assertEqual(changefeed.changes_after(cursor, limit=4), ([], cursor, False))
+
+    def test_exact_page_has_no_more(self):
+        changes, cursor, has_more = changefeed.changes_after(0, limit=6)
+        self.assertEqual(len(changes), 6)
+        self.assertFalse(has_more)
+
+    def test_recent_changes_and_everything_after_them_are_held_back(self):
+        first_pk = CustomerChange.objects.order_by('pk')[0].pk
+        CustomerChange.objects.exclude(pk=first_pk).update(changed_at=timezone.now() - timedelta(minutes=1))
+        with override_settings(CHANGE_FEED_SAFETY_LAG=30):
+            # הרשומה הראשונה עוד "בטיסה" - לא מתקדמים מעבר לה
+            self.assertEqual(changefeed.changes_after(0), ([], 0, False))
+            CustomerChange.objects.filter(pk=first_pk).update(changed_at=timezone.now() - timedelta(minutes=1))
+            self.assertEqual(len(changefeed.changes_after(0)[0]), 6)
+
+    @override_settings(ROOT_URLCONF='users.urls')
+    def test_page_view(self):
+        self.client.force_login(User.objects.create_user('sync', 'sync@example.com'))
+        body = self.client.get('/customers/changes/', {'cursor': 0, 'limit': 2}).json()
+        self.assertEqual(len(body['changes']), 2)
+        self.assertEqual(body['next_cursor'], body['changes'][-1]['cursor'])
+        self.assertTrue(body['has_more'])
+
+    @override_settings(ROOT_URLCONF='users.urls')
+    def test_stream_refuses_wsgi(self):
+        self.client.force_login(User.objects.create_user('sync', 'sync@example.com'))
+        self.assertEqual(self.client.get('/customers/changes/stream/').status_code, 501)
+
+    @override_settings(ROOT_URLCONF='users.urls', CHANGE_FEED_POLL_INTERVAL=0.01, CHANGE_FEED_STREAM_TIMEOUT=0.05)
+    async def test_stream_over_asgi_resumes_from_last_event_id(self):
+        user = await User.objects.acreate(username='sync', email='sync@example.com')
+        await self.async_client.aforce_login(user)
+        last_seen = await CustomerChange.objects.order_by('pk').values_list('pk', flat=True).afirst()
+        response = await self.async_client.get('/customers/changes/stream/', headers={'Last-Event-ID': str(last_seen)})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertTrue(body.startswith('retry: 10\n\n'))
+        ids = [int(line[4:]) for line in body.splitlines() if line.startswith('id: ')]
+        self.assertEqual(len(ids), 5)
+        self.assertGreater(min(ids), last_seen)
+
+
+# --- dashboard counters ------------------------------------------------------
+
+class DashboardCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        stats._pending.clear()
+        self.addCleanup(stats._pending.clear)
+        # בלי thread ברקע - הטסטים קוראים ל-flush בעצמם
+        flusher = mock.patch.object(stats, '_ensure_flusher')
+        self.ensure_flusher = flusher.start()
+        self.addCleanup(flusher.stop)
+
+    def counter(self, name):
+        return DashboardCounter.objects.filter(name=name).values_list('value', flat=True).first()
+
+    def test_deltas_are_buffered_until_flush(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_customer(1)
+            make_customer(2)
+        self.assertIsNone(self.counter(stats.CUSTOMERS_TOTAL))
+        self.assertEqual(stats.flush_pending(), 2)
+        self.assertEqual(self.counter(stats.CUSTOMERS_TOTAL), 2)
+        self.assertEqual(self.counter(stats.new_customers_key()), 2)
+        # שתי יצירות וביטול - UPDATE אחד בלבד
+        with self.captureOnCommitCallbacks(execute=True):
+            make_customer(3)
+            make_customer(4)
+            stats.increment(stats.CUSTOMERS_TOTAL, -3)
+        with self.assertNumQueries(3):  # זמן ה-reconcile האחרון + UPDATE לכל מונה
+            self.assertEqual(stats.flush_pending(), 2)
+        self.assertEqual(self.counter(stats.CUSTOMERS_TOTAL), 1)
+        self.assertEqual(self.counter(stats.new_customers_key()), 4)
+
+    def test_rolled_back_writes_are_not_counted(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            make_customer(1)
+        self.assertTrue(callbacks)
+        self.assertEqual(dict(stats._pending), {})
+
+    def test_flush_is_due_after_the_interval(self):
+        with override_settings(DASHBOARD_COUNTER_FLUSH_INTERVAL=0), self.captureOnCommitCallbacks(execute=True):
+            make_customer(1)
+        self.assertEqual(self.counter(stats.CUSTOMERS_TOTAL), 1)
+
+    def test_deltas_older_than_the_last_reconcile_are_dropped(self):
+        with mock.patch.object(stats, '_now_ms', return_value=1000), self.captureOnCommitCallbacks(execute=True):
+            make_customer(1)
+        # reconcile רץ בתהליך אחר (cron) - הבאפר של ה-worker לא מתרוקן
+        with mock.patch.object(stats, '_now_ms', return_value=2000), \
+                mock.patch.object(stats, '_pending', stats.defaultdict(list)):
+            stats.reconcile()
+        with mock.patch.object(stats, '_now_ms', return_value=3000), self.captureOnCommitCallbacks(execute=True):
+            make_customer(2)
+        stats.flush_pending()
+        self.assertEqual(self.counter(stats.CUSTOMERS_TOTAL), 2)
+        self.assertEqual(self.counter(stats.new_customers_key()), 2)
+
+    def test_pending_deltas_start_the_timed_flusher(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_customer(1)
+        self.assertTrue(self.ensure_flusher.called)
+        with mock.patch.object(stats.time, 'sleep', side_effect=[None, StopIteration]), \
+                self.assertRaises(StopIteration):
+            stats._run_flusher()
+        self.assertEqual(self.counter(stats.CUSTOMERS_TOTAL), 1)
+
+    def test_increment_leaves_the_cached_stats_alone(self):
+        cached = {'customers_total': 7}
+        cache.set(stats.CACHE_KEY, cached)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_customer(1)
+        stats.flush_pending()
+        self.assertEqual(stats.dashboard_stats(), cached)
+
+    def test_active_user_counter(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.create_user('dana', 'dana@example.com')
+            User.objects.create_user('gone', 'gone@example.com', is_active=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            user.is_active = False
+            user.save()
+            user.is_active = True
+            user.save()
+        stats.flush_pending()
+        self.assertEqual(self.counter(stats.ACTIVE_USERS), 1)
+
+    def test_reconcile_counts_distinct_locked_out_accounts(self):
+        now = timezone.now()
+        for username, ip, failures in (('dana', '10.0.0.1', 5), ('dana', '10.0.0.2', 9), ('yossi', '10.0.0.1', 1)):
+            AccessAttempt.objects.create(username=username, ip_address=ip, user_agent='test', failures_since_start=failures,
+                                         attempt_time=now, get_data='', post_data='', http_accept='', path_info='/login/')
+        # האות של axes נשלח בכל ניסיון מעל הסף - לא משפיע על המונה
+        for _ in range(3):
+            user_locked_out.send(sender=self.__class__, request=None, username='dana', ip_address='10.0.0.1')
+        self.assertIsNone(self.counter(stats.LOCKED_OUT))
+        stats.reconcile()
+        self.assertEqual(self.counter(stats.LOCKED_OUT), 1)
+
+    def test_dashboard_stats_initialise_from_reconcile(self):
+        make_customer(1)
+        self.assertEqual(stats.dashboard_stats()['customers_total'], 1)
+
+
+# --- backfills ---------------------------------------------------------------
+
+class RecordingBackfill(backfill.Backfill):
+    name = 'recording'
+    model = Customer
+
+    def __init__(self):
+        self.chunks = []
+
+    def process_chunk(self, rows):
+        self.chunks.append([row.pk for row in rows])
+        return 0
+
+
+class BackfillTests(TestCase):
+    def setUp(self):
+        self.customers = [make_customer(n, phone_number=f'050-{n:07d}'[:11]) for n in range(5)]
+
+    def run_backfill(self, job, **options):
+        options.setdefault('sleep', 0)
+        return backfill.run_backfill(job, **options)
+
+    def test_resumes_from_checkpoint(self):
+        job = RecordingBackfill()
+        checkpoint = self.run_backfill(job, chunk_size=2, max_chunks=1)
+        self.assertEqual(checkpoint.last_pk, self.customers[1].pk)
+        self.assertIsNone(checkpoint.completed_at)
+        checkpoint = self.run_backfill(job, chunk_size=2)
+        self.assertEqual(sum(job.chunks, []), [customer.pk for customer in self.customers])
+        self.assertEqual(checkpoint.rows_processed, 5)
+        self.assertIsNotNone(checkpoint.completed_at)
+        # הריצה הסתיימה - הרצה נוספת לא עוברת שוב על השורות
+        self.run_backfill(job, chunk_size=2)
+        self.assertEqual(len(sum(job.chunks, [])), 5)
+
+    def test_restart(self):
+        job = RecordingBackfill()
+        self.run_backfill(job)
+        checkpoint = self.run_backfill(job, restart=True)
+        self.assertEqual(checkpoint.rows_processed, 5)
+        self.assertEqual(len(job.chunks), 2)
+
+    def test_chunks_never_grow_past_the_requested_size(self):
+        job = RecordingBackfill()
+        self.run_backfill(job, chunk_size=2, max_chunk_seconds=60)
+        self.assertEqual([len(chunk) for chunk in job.chunks], [2, 2, 1])
+
+    def test_slow_chunks_shrink(self):
+        for n in range(5, 30):
+            make_customer(n)
+        job = RecordingBackfill()
+        with mock.patch.object(backfill.time, 'monotonic', side_effect=[0, 100] * 10):
+            self.run_backfill(job, chunk_size=20, max_chunk_seconds=1)
+        self.assertEqual([len(chunk) for chunk in job.chunks], [20, 10])
+
+    def test_small_requested_chunks_do_not_grow_when_slow(self):
+        job = RecordingBackfill()
+        with mock.patch.object(backfill.time, 'monotonic', side_effect=[0, 100] * 10):
+            self.run_backfill(job, chunk_size=2, max_chunk_seconds=1)
+        self.assertEqual([len(chunk) for chunk in job.chunks], [2, 2, 1])
+
+    def test_second_runner_is_refused(self):
+        BackfillCheckpoint.objects.create(name='recording', locked_by='other:1', locked_at=timezone.now())
+        with self.assertRaises(backfill.BackfillLocked):
+            self.run_backfill(RecordingBackfill())
+        self.assertEqual(BackfillCheckpoint.objects.get(name='recording').last_pk, 0)
+
+    def test_stale_lock_is_taken_over_and_released(self):
+        BackfillCheckpoint.objects.create(name='recording', locked_by='other:1',
+                                          locked_at=timezone.now() - timedelta(hours=1))
+        checkpoint = self.run_backfill(RecordingBackfill())
+        self.assertIsNotNone(checkpoint.completed_at)
+        self.assertEqual(BackfillCheckpoint.objects.get(name='recording').locked_by, '')
+
+    def test_runner_stops_when_its_lock_is_taken_over(self):
+        class TakenOver(RecordingBackfill):
+            def process_chunk(self, rows):
+                BackfillCheckpoint.objects.filter(name=self.name).update(locked_by='other:1')
+                return super().process_chunk(rows)
+
+        job = TakenOver()
+        with self.assertRaises(backfill.BackfillLocked):
+            self.run_backfill(job, chunk_size=2)
+        self.assertEqual(len(job.chunks), 1)
+        # לא משחררים חכירה שכבר שייכת ל-runner אחר
+        self.assertEqual(BackfillCheckpoint.objects.get(name='recording').locked_by, 'other:1')
+
+    def test_normalize_phones_skips_values_that_would_be_invalid(self):
+        short = make_customer(9, phone_number='050-123456')
+        checkpoint = self.run_backfill(backfill.REGISTRY['normalize_customer_phones']())
+        self.assertEqual(checkpoint.rows_changed, 5)
+        self.assertEqual(Customer.objects.get(pk=self.customers[1].pk).phone_number, '0500000001')
+        self.assertEqual(Customer.objects.get(pk=short.pk).phone_number, '050-123456')
+        for customer in Customer.objects.exclude(pk=short.pk):
+            customer.full_clean()
+
+    def test_normalize_phones_writes_full_change_feed_snapshots(self):
+        self.run_backfill(backfill.REGISTRY['normalize_customer_phones']())
+        change = CustomerChange.objects.filter(customer_pk=self.customers[1].pk).latest('pk')
+        self.assertEqual(change.data, {
+            'customer_id': 'C00001', 'firstname': 'First1', 'lastname': 'Last1',
+            'email': 'customer1@example.com', 'phone_number': '0500000001',
+        })
+
+
+# --- password configuration --------------------------------------------------
+
+class PasswordConfigTests(TestCase):
+    def write_config(self, data):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory)
+        path = directory / 'password_config.json'
+        path.write_text(json.dumps(data), encoding='utf-8')
+        return path
+
+    def test_flat_keys_are_mapped(self):
+        config = password_config.load_password_config(self.write_config({
+            'min_length': 12,
+            'require_uppercase': False,
+            'require_numbers': False,
+            'require_special': True,
+            'prevent_dictionary': False,
+            'password_history': 5,
+            'login_attempts': 7,
+        }))
+        self.assertEqual(config['min_password_length'], 12)
+        self.assertEqual(config['password_requirements'],
+                         {'uppercase': False, 'lowercase': True, 'digits': False, 'special_characters': True})
+        self.assertFalse(config['dictionary_check'])
+        self.assertEqual((config['password_history'], config['login_attempts']), (5, 7))
+
+    def test_nested_keys_and_missing_file(self):
+        config = password_config.load_password_config(self.write_config({'password_requirements': {'digits': False}}))
+        self.assertFalse(config['password_requirements']['digits'])
+        self.assertTrue(config['password_requirements']['uppercase'])
+        missing = password_config.load_password_config(Path(tempfile.gettempdir()) / 'no-such-config.json')
+        self.assertEqual(missing, password_config.DEFAULT_PASSWORD_CONFIG)
+        # עותק - שינוי בתוצאה לא משנה את ברירות המחדל
+        self.assertIsNot(missing['password_requirements'], password_config.DEFAULT_PASSWORD_CONFIG['password_requirements'])
+
+    def test_default_path_comes_from_settings(self):
+        path = self.write_config({'min_length': 14})
+        with override_settings(PASSWORD_CONFIG_PATH=path):
+            self.assertEqual(password_config.load_password_config()['min_password_length'], 14)
+
+    def test_axes_failure_limit_callable(self):
+        with mock.patch.object(password_config, 'load_password_config', return_value={'login_attempts': 7}):
+            self.assertEqual(password_config.axes_failure_limit(None, {}), 7)
+            self.assertEqual(get_failure_limit(None, {}), 7)
+
+    def test_validator_reads_config_once_on_first_use(self):
+        config = password_config.load_password_config()
+        with mock.patch.object(validators, 'load_password_config', return_value=config) as load:
+            validator = validators.CustomPasswordValidator(min_length=12)
+            load.assert_not_called()
+            validator.validate(STRONG_PASSWORD)
+            with self.assertRaisesMessage(ValidationError, 'at least 12 characters'):
+                validator.validate('Sh0rt!pass')
+            self.assertIn('12 characters', validator.get_help_text())
+        load.assert_called_once_with()
+
+    def test_validator_uses_config_for_options_not_given(self):
+        validator = validators.CustomPasswordValidator(require_special_characters=False)
+        validator.validate('NoSpecial1234')
+        with self.assertRaises(ValidationError):
+            validator.validate('nouppercase1!')
+
+
+# --- static files ------------------------------------------------------------
+
+HASHED_CSS = 'css/app.0123456789ab.css'
+
+
+@override_settings(ROOT_URLCONF='users.urls', STATIC_URL='/static/')
+class StaticFilesMiddlewareTests(TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.root = self.directory / 'staticfiles'
+        (self.root / 'css').mkdir(parents=True)
+        for name, content in ((HASHED_CSS, b'body{}'), (HASHED_CSS + '.gz', b'gzip'), (HASHED_CSS + '.br', b'brotli'),
+                              ('css/plain.css', b'plain{}')):
+            (self.root / name).write_bytes(content)
+        (self.directory / 'secret.txt').write_bytes(b'secret')
+        root_setting = override_settings(STATIC_ROOT=self.root)
+        root_setting.enable()
+        self.addCleanup(root_setting.disable)
+        staticfiles._hashed_paths.clear()
+        self.addCleanup(staticfiles._hashed_paths.clear)
+
+    def get(self, name, accept_encoding=''):
+        return self.client.get(f'/static/{name}', headers={'Accept-Encoding': accept_encoding})
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_prefers_brotli_then_gzip(self):
+        response = self.get(HASHED_CSS, 'gzip, deflate, br')
+        self.assertEqual((response['Content-Encoding'], self.body(response)), ('br', b'brotli'))
+        response = self.get(HASHED_CSS, 'gzip, br;q=0')
+        self.assertEqual((response['Content-Encoding'], self.body(response)), ('gzip', b'gzip'))
+        self.assertEqual(response['Content-Length'], '4')
+        response = self.get(HASHED_CSS)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(self.body(response), b'body{}')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Content-Type'], 'text/css; charset=utf-8')
+        self.assertIn('filename="app.0123456789ab.css"', response['Content-Disposition'])
+
+    def test_missing_variant_falls_back_to_identity(self):
+        response = self.get('css/plain.css', 'br, gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(self.body(response), b'plain{}')
+
+    def test_cache_headers(self):
+        self.assertEqual(self.get(HASHED_CSS)['Cache-Control'], staticfiles.IMMUTABLE_CACHE_CONTROL)
+        with override_settings(STATIC_UNHASHED_MAX_AGE=60):
+            self.assertEqual(self.get('css/plain.css')['Cache-Control'], 'public, max-age=60')
+
+    def test_path_traversal_is_rejected(self):
+        for name in ('../secret.txt', 'css/../../secret.txt', '%2e%2e/secret.txt'):
+            response = self.get(name)
+            self.assertEqual(response.status_code, 404, name)
+            self.assertNotIn(b'secret', response.content)
+
+    def test_unhashed_files_are_looked_up_every_time(self):
+        self.assertEqual(self.get('css/new.css').status_code, 404)
+        (self.root / 'css/new.css').write_bytes(b'new{}')
+        self.assertEqual(self.body(self.get('css/new.css')), b'new{}')
+        (self.root / 'css/new.css').unlink()
+        self.assertEqual(self.get('css/new.css').status_code, 404)
+
+    def test_hashed_file_removed_after_caching_is_a_404(self):
+        self.assertEqual(self.get(HASHED_CSS, 'gzip').status_code, 200)
+        for suffix in ('', '.gz', '.br'):
+            (self.root / f'{HASHED_CSS}{suffix}').unlink()
+        self.assertEqual(self.get(HASHED_CSS, 'gzip').status_code, 404)
+        self.assertEqual(staticfiles._hashed_paths, {})
+
+    def test_head_and_other_methods(self):
+        response = self.client.head(f'/static/{HASHED_CSS}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], '6')
+        self.assertEqual(self.body(response), b'')
+        self.assertEqual(self.client.post(f'/static/{HASHED_CSS}').status_code, 405)
+
+    def test_accepted_encodings(self):
+        self.assertEqual(staticfiles.accepted_encodings('gzip;q=1.0, br;q=0, identity'), {'gzip', 'identity'})
+        self.assertEqual(staticfiles.accepted_encodings(''), set())
+
+
+# --- anonymous page cache ----------------------------------------------------
+
+CSRF_VALUE_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = Client(enforce_csrf_checks=True)
+
+    def csrf_token(self, response):
+        return CSRF_VALUE_RE.search(response.content.decode()).group(1)
+
+    def test_cached_page_gets_a_working_token(self):
+        self.client.get('/login/')
+        response = self.client.get('/login/')
+        self.assertNotIn(pagecache.CSRF_PLACEHOLDER, response.content.decode())
+        with mock.patch.object(audit, 'record'):
+            response = self.client.post('/login/', {
+                'username': 'nobody', 'password': 'Wr0ng!Password', 'csrfmiddlewaretoken': self.csrf_token(response),
+            })
+        self.assertEqual(response.status_code, 200)
+
+    def test_not_modified_only_for_the_same_csrf_cookie(self):
+        first = self.client.get('/login/')
+        etag = first['ETag']
+        self.assertFalse(first.has_header('Last-Modified'))
+        self.assertEqual(self.client.get('/login/', headers={'If-None-Match': etag}).status_code, 304)
+
+        # אותו גוף, cookie אחר: הטוקן בעותק של הדפדפן כבר לא תקף
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'x' * 32
+        response = self.client.get('/login/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        anonymous = Client(enforce_csrf_checks=True)
+        self.assertEqual(anonymous.get('/login/', headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_if_modified_since_alone_is_ignored(self):
+        self.client.get('/login/')
+        response = self.client.get('/login/', headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_pending_messages_bypass_the_cache_and_are_shown(self):
+        self.client.get('/login/')
+        request = RequestFactory().get('/login/')
+        request.session = self.client.session
+        storage = default_storage(request)
+        storage.add(messages.SUCCESS, 'Password changed, please log in')
+        response = HttpResponse()
+        storage.update(response)
+        self.client.cookies.update(response.cookies)
+        response = self.client.get('/login/')
+        self.assertFalse(response.has_header('ETag'))
+        self.assertContains(response, 'Password changed, please log in')
+
+    def test_authenticated_users_bypass_the_cache(self):
+        User.objects.create_user('dana', 'dana@example.com', STRONG_PASSWORD)
+        self.client.get('/login/')
+        self.client.force_login(User.objects.get(username='dana'))
+        response = self.client.get('/login/')
+        self.assertFalse(response.has_header('ETag'))
+
+
+# --- duplicate customers -----------------------------------------------------
+
+class NormalizeTests(TestCase):
+    def test_canonical_email(self):
+        self.assertEqual(canonical_email(' Dana.Levi+news@GoogleMail.com '), 'danalevi@gmail.com')
+        self.assertEqual(canonical_email('dana.levi+x@example.com'), 'dana.levi@example.com')
+        self.assertEqual(canonical_email('not-an-email'), 'not-an-email')
+        self.assertEqual(canonical_email(None), '')
+
+    def test_normalize_phone(self):
+        self.assertEqual(normalize_phone('+972-50-123-4567'), '0501234567')
+        self.assertEqual(normalize_phone('050 123 4567'), '0501234567')
+        self.assertEqual(normalize_phone('972123'), '972123')
+        self.assertEqual(normalize_phone(None), '')
+
+    def test_fold_name(self):
+        self.assertEqual(fold_name('Levi', 'Dana'), fold_name('dana', 'LEVI'))
+        self.assertEqual(fold_name('José', 'Núñez'), 'jose nunez')
+
+    def test_keys_that_grow_when_normalised_fit_their_columns(self):
+        # casefold/NFKD מאריכים: 'ß' -> 'ss', 'ﬃ' -> 'ffi', 'İ'.lower() הוא שני תווים
+        name_key = fold_name('ß' * 50, 'ﬃ' * 50)
+        email_key = canonical_email('İ' * 60 + '@example.com')
+        self.assertEqual(len(name_key), Customer._meta.get_field('name_key').max_length)
+        self.assertEqual(len(email_key), Customer._meta.get_field('email_canonical').max_length)
+        customer = Customer(firstname='ß' * 50, lastname='ﬃ' * 50, customer_id='C00001',
+                            email='İ' * 60 + '@example.com', phone_number='0501234567')
+        customer.save()
+        customer.refresh_from_db()
+        self.assertEqual((customer.name_key, customer.email_canonical), (name_key, email_key))
+
+
+class DuplicateCustomerTests(TestCase):
+    def test_clean_rejects_a_duplicate_email_or_phone(self):
+        existing = make_customer(1, email='dana.levi@gmail.com')
+        for fields in ({'email': 'DanaLevi+shop@gmail.com'}, {'phone_number': '+972-50-000-0001'}):
+            with self.subTest(fields=fields), self.assertRaisesMessage(ValidationError, existing.customer_id):
+                Customer(**{**dict(firstname='A', lastname='B', customer_id='C99999',
+                                   email='other@example.com', phone_number='0529999999'), **fields}).clean()
+
+    def test_clean_allows_editing_the_same_customer(self):
+        customer = make_customer(1)
+        customer.firstname = 'Renamed'
+        customer.clean()
+
+    def test_clusters_are_transitive(self):
+        a = make_customer(1, email='a@example.com')
+        b = make_customer(2, email='A@example.com', phone_number='0500000099')
+        c = make_customer(3, phone_number='+972500000099')
+        make_customer(4)
+        self.assertEqual(dedupe.cluster_duplicates(), [[a.pk, b.pk, c.pk]])
+
+    def test_name_matching_is_opt_in(self):
+        a = make_customer(1, firstname='Dana', lastname='Levi')
+        b = make_customer(2, firstname='levi', lastname='DANA')
+        self.assertEqual(dedupe.cluster_duplicates(), [])
+        self.assertEqual(dedupe.cluster_duplicates(dedupe.BLOCKING_FIELDS + ('name_key',)), [[a.pk, b.pk]])
+
+    def test_command_fetches_clusters_in_batches(self):
+        clusters = []
+        for n in range(0, 12, 2):
+            first = make_customer(n)
+            second = make_customer(n + 1, email=first.email.upper())
+            clusters.append([first.pk, second.pk])
+        out = io.StringIO()
+        # שאילתה לכל שדה blocking ושתי שאילתות שליפה (6 pk ואז 6 pk), לא אחת לכל אשכול
+        with mock.patch('users.management.commands.find_duplicate_customers.FETCH_BATCH_SIZE', 6), \
+                self.assertNumQueries(len(dedupe.BLOCKING_FIELDS) + 2):
+            call_command('find_duplicate_customers', '--json', stdout=out)
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([[row['pk'] for row in cluster] for cluster in lines], clusters)
@@ -6,9 +6,17 @@ urlpatterns = [
     path('register/', views.register, name='register'),
     path('login/', views.user_login, name='login'),
     path('logout/', views.user_logout, name='logout'),
+    path('home/', views.home, name='home'),
     path('change-password/', views.CustomPasswordChangeView.as_view(), name='change_password'),
     path('password-change-done/', views.password_change_done, name='password_change_done'),
     path('create-customer/', views.create_customer, name='create_customer'),
+    path('customers/search/', views.customer_search, name='customer_search'),
+    path('customers/changes/', views.customer_changes, name='customer_changes'),
+    path('customers/changes/stream/', views.customer_changes_stream, name='customer_changes_stream'),
+    path('profiler/', views.profiler_status, name='profiler_status'),
+    path('profiler/arm/', views.profiler_arm, name='profiler_arm'),
+    path('profiler/captures/<str:name>/', views.profiler_download, name='profiler_download'),
+    path('audit/stats/', views.audit_stats, name='audit_stats'),
     path('forgot-password/', views.forgot_password, name='forgot_password'),
     path('reset-password/', views.reset_password, name='reset_password'),
 ]
@@ -4,18 +4,40 @@ import hashlib
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext as _
 import re
+from Communication_LTD.password_config import load_password_config
 
 class CustomPasswordValidator:
     """Validator for password strength."""
-    def __init__(self, min_length, require_uppercase, require_lowercase, require_digits, require_special_characters, dictionary_check):
+    def __init__(self, min_length=None, require_uppercase=None, require_lowercase=None, require_digits=None, require_special_characters=None, dictionary_check=None):
+        # ערכים שלא הועברו ב-OPTIONS נלקחים מ-password_config.json בשימוש הראשון
         self.min_length = min_length
         self.require_uppercase = require_uppercase
         self.require_lowercase = require_lowercase
         self.require_digits = require_digits
         self.require_special_characters = require_special_characters
         self.dictionary_check = dictionary_check
+        self._resolved = False
+
+    def _resolve(self):
+        if self._resolved:
+            return
+        config = load_password_config()
+        requirements = config["password_requirements"]
+        defaults = {
+            'min_length': config["min_password_length"],
+            'require_uppercase': requirements.get("uppercase", True),
+            'require_lowercase': requirements.get("lowercase", True),
+            'require_digits': requirements.get("digits", True),
+            'require_special_characters': requirements.get("special_characters", True),
+            'dictionary_check': config.get("dictionary_check", True),
+        }
+        for name, value in defaults.items():
+            if getattr(self, name) is None:
+                setattr(self, name, value)
+        self._resolved = True
 
     def validate(self, password, user=None):
+        self._resolve()
         if len(password) < self.min_length:
             raise ValidationError(
                 _(f"Password must be at least {self.min_length} characters long."),
@@ -55,14 +77,21 @@ class CustomPasswordValidator:
                 )
 
     def get_help_text(self):
+        self._resolve()
         return _(
             f"Your password must be at least {self.min_length} characters long and contain at least one uppercase letter, one lowercase letter, one digit, and one special character."
         )
 
 class PasswordHistoryValidator:
     """Validator to prevent reuse of recent passwords."""
-    def __init__(self, password_history):
-        self.password_history = password_history
+    def __init__(self, password_history=None):
+        self._password_history = password_history
+
+    @property
+    def password_history(self):
+        if self._password_history is not None:
+            return self._password_history
+        return load_password_config().get("password_history", 3)
     
     def validate(self, password, user=None):
         if user:
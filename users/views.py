@@ -5,8 +5,18 @@ from django.contrib.auth.views import PasswordChangeView
 from django.urls import reverse_lazy
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
 from .forms import RegisterForm, CustomerForm, CustomPasswordChangeForm, ResetPasswordForm
 from .models import User
+from .routers import read_from_replica
+from .search import search_customers
+from . import audit, profiling
+from .stats import dashboard_stats
+from .pagecache import cache_anonymous_page
+from .changefeed import changes_after, stream_changes, DEFAULT_PAGE_SIZE
 import hashlib
 import random
 from django.core.mail import send_mail
@@ -20,12 +30,14 @@ def send_reset_email(user, token):
     send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
 
 # View להתחברות משתמש
+@cache_anonymous_page
 def user_login(request):
     """Handle user login"""
     if request.method == 'POST':
         username = request.POST.get('username')
         password = request.POST.get('password')
 
+        # ReplicaModelBackend מחפש את המשתמש ברפליקה (וב-primary רק אם השורה חסרה)
         user = authenticate(request, username=username, password=password)
         if user is not None:
             django_login(request, user)
@@ -35,7 +47,15 @@ def user_login(request):
             messages.error(request, "Invalid username or password. Please try again.")
     return render(request, 'users/login.html')
 
+# View להתנתקות משתמש
+def user_logout(request):
+    """Log the user out"""
+    django_logout(request)
+    messages.success(request, "Logged out successfully.")
+    return redirect('login')
+
 # View להרשמת משתמש חדש
+@cache_anonymous_page
 def register(request):
     """Handle user registration"""
     if request.method == 'POST':
@@ -55,7 +75,7 @@ def register(request):
 @login_required
 def home(request):
     """Render the home page"""
-    return render(request, 'users/home.html')
+    return render(request, 'users/home.html', {'stats': dashboard_stats()})
 
 # View מותאם אישית לשינוי סיסמא
 class CustomPasswordChangeView(PasswordChangeView):
@@ -67,6 +87,7 @@ class CustomPasswordChangeView(PasswordChangeView):
     def form_valid(self, form):
         """Update the session after password change"""
         response = super().form_valid(form)
+        audit.record(audit.PASSWORD_CHANGE, username=self.request.user.get_username(), ip=audit.client_ip(self.request))
         messages.success(self.request, "Your password was changed successfully.")
         return response
 
@@ -83,7 +104,7 @@ def create_customer(request):
     if request.method == 'POST':
         form = CustomerForm(request.POST)
         if form.is_valid():
-            customer = form.save()
+            customer = form.save()  # אירוע ה-audit נרשם ב-signal (גם ליצירה מה-admin)
             messages.success(request, f"Customer {customer.firstname} {customer.lastname} added successfully!")
             return redirect('home')
         else:
@@ -93,7 +114,94 @@ def create_customer(request):
 
     return render(request, 'users/create_customer.html', {'form': form})
 
+# View לחיפוש לקוחות (JSON) מתוך אינדקס הטקסט המלא
+@login_required
+def customer_search(request):
+    """Return ranked customers matching the `q` parameter"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(int(request.GET.get('limit', 20)), 100)
+    except ValueError:
+        limit = 20
+    customers = read_from_replica(lambda: list(search_customers(query, limit=limit)))
+    results = [
+        {
+            'customer_id': customer.customer_id,
+            'firstname': customer.firstname,
+            'lastname': customer.lastname,
+            'email': customer.email,
+            'phone_number': customer.phone_number,
+        }
+        for customer in customers
+    ]
+    return JsonResponse({'query': query, 'results': results})
+
+# Views לניהול פרופיילר הבקשות (מנהלים בלבד)
+@staff_member_required
+def profiler_status(request):
+    """Show the current arm config and the stored captures"""
+    return JsonResponse({'armed': profiling.current_arming(), 'captures': profiling.list_captures()})
+
+@staff_member_required
+@require_POST
+def profiler_arm(request):
+    """Arm or disarm the request profiler"""
+    if request.POST.get('disarm'):
+        profiling.disarm()
+        return JsonResponse({'armed': None})
+    paths = request.POST.getlist('path') or ['/register/', '/change-password/']
+    try:
+        sample_rate = float(request.POST.get('sample_rate', 1.0))
+        duration = int(request.POST.get('duration', 300))
+    except ValueError:
+        return JsonResponse({'error': "sample_rate and duration must be numbers."}, status=400)
+    return JsonResponse({'armed': profiling.arm(paths, sample_rate=sample_rate, duration=duration)})
+
+@staff_member_required
+def audit_stats(request):
+    """Expose the audit pipeline counters (enqueued, flushed, dropped, pending)"""
+    return JsonResponse(audit.pipeline.stats())
+
+@staff_member_required
+def profiler_download(request, name):
+    """Download one capture file for offline analysis"""
+    path = profiling.capture_path(name)
+    if path is None:
+        raise Http404("No such capture.")
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
+
+def _cursor_param(value, default=0):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return default
+
+# View לסנכרון מצטבר של לקוחות לפי cursor (billing, CRM)
+@login_required
+def customer_changes(request):
+    """Return a page of customer changes after the given cursor"""
+    cursor = _cursor_param(request.GET.get('cursor'))
+    limit = _cursor_param(request.GET.get('limit'), DEFAULT_PAGE_SIZE)
+    changes, next_cursor, has_more = changes_after(cursor, limit)
+    return JsonResponse({'changes': changes, 'next_cursor': next_cursor, 'has_more': has_more})
+
+# View לזרם SSE של שינויים חיים - רק מאחורי שרת ASGI (ב-WSGI כל חיבור פתוח תופס worker)
+@login_required
+async def customer_changes_stream(request):
+    """Stream customer changes as server-sent events"""
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(
+            "The change stream needs an ASGI server (Communication_LTD.asgi); poll customers/changes/ instead.",
+            status=501,
+        )
+    cursor = _cursor_param(request.headers.get('Last-Event-ID') or request.GET.get('cursor'))
+    response = StreamingHttpResponse(stream_changes(cursor), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 # View לפעולת שכחת סיסמא
+@cache_anonymous_page
 def forgot_password(request):
     """Handle forgot password functionality"""
     if request.method == 'POST':
@@ -108,9 +216,11 @@ def forgot_password(request):
             
             # Send reset token to email
             send_reset_email(user, reset_token)
+            audit.record(audit.PASSWORD_RESET_REQUEST, username=user.username, ip=audit.client_ip(request))
             
             messages.success(request, "Reset token sent to your email.")
         except User.DoesNotExist:
+            audit.record(audit.PASSWORD_RESET_REQUEST, ip=audit.client_ip(request), found=False)
             messages.error(request, "No user found with this email.")
     return render(request, 'users/forgot_password.html')
 
@@ -127,6 +237,7 @@ def reset_password(request):
                 user.set_password(new_password)
                 user.reset_token = None  # Clear the reset token
                 user.save()
+                audit.record(audit.PASSWORD_RESET_REDEEM, username=user.username, ip=audit.client_ip(request))
                 messages.success(request, "Password reset successfully.")
                 return redirect('login')
             except User.DoesNotExist: